@@ -2,19 +2,33 @@
 # -*- coding: utf-8 -*-
 # Flask API for Moroccan Plate Detection & Recognition
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, Response, url_for, stream_with_context
 from flask_cors import CORS
 import os
 import cv2
 import numpy as np
 import base64
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from datetime import datetime
+import time
 import tempfile
+import threading
+import contextvars
 
 # Import existing detection and OCR modules
 from detection import PlateDetector
 from ocr import PlateReader
+from tesseract_pool import TesseractPool
+from serving import DeadlineExceeded, InferenceScheduler, PRIORITIES, ServingError
+import transport
+from watchlist import WatchlistIndex
+from frame_gate import FrameGate, union_roi
+from roi import RoiConfig
+from image_store import ImageStore
+from recognition_log import DetectionLog
+import export
+from tracing import SamplingProfiler, current_trace, end_trace, stage, start_trace
 from utility import enum
 import arabic_reshaper
 from bidi.algorithm import get_display
@@ -35,6 +49,27 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max size
+# Tesseract fallback: used when YOLO OCR is empty or below this mean confidence
+app.config['TESSERACT_WORKERS'] = int(os.environ.get('TESSERACT_WORKERS', 2))
+app.config['TESSERACT_TIMEOUT'] = float(os.environ.get('TESSERACT_TIMEOUT', 2.0))
+app.config['OCR_FALLBACK_CONFIDENCE'] = float(os.environ.get('OCR_FALLBACK_CONFIDENCE', 0.5))
+# Admission control: inference workers, queue bound and default deadlines (seconds)
+app.config['INFERENCE_WORKERS'] = int(os.environ.get('INFERENCE_WORKERS', 1))
+app.config['INFERENCE_QUEUE'] = int(os.environ.get('INFERENCE_QUEUE', 32))
+app.config['INTERACTIVE_DEADLINE'] = float(os.environ.get('INTERACTIVE_DEADLINE', 10))
+app.config['BULK_DEADLINE'] = float(os.environ.get('BULK_DEADLINE', 120))
+# Watchlist: optional CSV (plate,list,note) loaded at startup, fuzzy match radius in edits
+app.config['WATCHLIST_FILE'] = os.environ.get('WATCHLIST_FILE')
+app.config['WATCHLIST_MAX_DISTANCE'] = float(os.environ.get('WATCHLIST_MAX_DISTANCE', 1.0))
+# Content-addressed result images served under /images/<hash>
+app.config['IMAGE_STORE'] = os.environ.get('IMAGE_STORE', './store')
+app.config['IMAGE_STORE_MAX_MB'] = int(os.environ.get('IMAGE_STORE_MAX_MB', 2048))
+# Per-source static ROIs (JSON, see roi.py); sources are chosen with ?source=
+app.config['ROI_CONFIG'] = os.environ.get('ROI_CONFIG', './roi_config.json')
+# Recognition history (detection_logs table)
+app.config['DETECTION_LOG_DB'] = os.environ.get('DETECTION_LOG_DB', './detection_logs.db')
+# Required in X-Admin-Token for /admin/* when set
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
 
 # Initialize detector and reader models
 detector = PlateDetector()
@@ -45,11 +80,45 @@ reader = PlateReader()
 reader.load_model("./weights/ocr/yolov3-ocr_final.weights", 
                  "./weights/ocr/yolov3-ocr.cfg")
 
+tesseract_pool = TesseractPool(max_workers=app.config['TESSERACT_WORKERS'],
+                               timeout=app.config['TESSERACT_TIMEOUT'])
+
+scheduler = InferenceScheduler(workers=app.config['INFERENCE_WORKERS'],
+                               max_queue=app.config['INFERENCE_QUEUE'])
+
+profiler = SamplingProfiler()
+
+roi_config = RoiConfig.load(app.config['ROI_CONFIG']) if os.path.exists(app.config['ROI_CONFIG']) else RoiConfig()
+
+detection_log = DetectionLog(app.config['DETECTION_LOG_DB'])
+
+image_store = ImageStore(app.config['IMAGE_STORE'], max_bytes=app.config['IMAGE_STORE_MAX_MB'] * 1024 * 1024)
+# Endpoints that run inference (traced stages, eligible for profiling) and their deadline class
+INFERENCE_ENDPOINTS = {'detect_plate': PRIORITIES.INTERACTIVE, 'read_plate': PRIORITIES.INTERACTIVE,
+                       'upload_image': PRIORITIES.BULK, 'upload_video': PRIORITIES.BULK}
+
+watchlist = WatchlistIndex()
+# match() rejects radii the deletion index cannot answer; fail here, not as a 500 on every /ocr
+if not 0 <= app.config['WATCHLIST_MAX_DISTANCE'] < watchlist.max_edits + 1:
+    raise ValueError(f"WATCHLIST_MAX_DISTANCE must be in [0, {watchlist.max_edits + 1}), "
+                     f"got {app.config['WATCHLIST_MAX_DISTANCE']}")
+if app.config['WATCHLIST_FILE'] and os.path.exists(app.config['WATCHLIST_FILE']):
+    app.logger.info(f"Loaded {watchlist.load_csv(app.config['WATCHLIST_FILE'])} watchlist plates")
+
 # Helper functions
-def base64_encode_image(image_path):
-    """Convert image to base64 string"""
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode('utf-8')
+def read_image_bytes(image_path):
+    """Raw bytes of an image file (encoded per the Accept header by respond())"""
+    with stage("read"), open(image_path, "rb") as img_file:
+        return img_file.read()
+
+def encode_image(image):
+    """JPEG-encode an image in memory (no tmp file write + read back)"""
+    with stage("encode"):
+        ok, buffer = cv2.imencode(".jpg", image)
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    # memoryview over the encoder's buffer: no extra copy until the transport encodes it
+    return memoryview(buffer.reshape(-1))
 
 def save_file_from_request(request_file):
     """Save uploaded file to disk"""
@@ -79,6 +148,209 @@ def save_base64_image(base64_string, prefix="image"):
         app.logger.error(f"Error saving base64 image: {str(e)}")
         return None
 
+def save_raw_image(stream, prefix="image"):
+    """Stream a raw image request body (application/octet-stream, image/*) to disk"""
+    try:
+        fd, filepath = tempfile.mkstemp(prefix=prefix, suffix=".jpg", dir=app.config['UPLOAD_FOLDER'])
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                f.write(chunk)
+        return filepath if os.path.getsize(filepath) else None
+    except HTTPException:
+        # RequestEntityTooLarge from the size-limited stream: a 413, not a bad image
+        raise
+    except Exception as e:
+        app.logger.error(f"Error saving raw image: {str(e)}")
+        return None
+
+def is_raw_upload():
+    return request.mimetype in transport.RAW_IMAGE_TYPES
+
+def store_image(data, thumbnail=False):
+    """
+    Put image bytes in the content store; returns {'url': ..., 'thumbnail_url': ...}.
+    Behind gateway.py the URLs carry ?worker=<n>, so the gateway routes them
+    back to this process' store.
+    """
+    with stage("store"):
+        digest = image_store.put(data, thumbnail=thumbnail)
+    args = {'worker': request.headers['X-Gateway-Worker']} if 'X-Gateway-Worker' in request.headers else {}
+    urls = {"url": url_for('get_image', digest=digest, **args)}
+    if thumbnail:
+        urls["thumbnail_url"] = url_for('get_image_thumbnail', digest=digest, **args)
+    return urls
+
+def inline_images():
+    """False when the client asked for image URLs only (?images=url)"""
+    return request.args.get('images', 'inline') != 'url'
+
+def log_recognition(plate_text, confidence, started, default_source):
+    """Record a recognized plate; source from ?source= (camera id / source type)"""
+    if not plate_text:
+        return
+    try:
+        detection_log.record(plate_text, request.args.get('source', default_source), confidence,
+                             (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        app.logger.warning(f"Failed to log recognition: {str(e)}")
+
+def respond(payload, status=200):
+    """Encode a payload holding raw image bytes as JSON/base64, msgpack or multipart/mixed"""
+    trace = current_trace()
+    if trace is not None and (request.args.get('timings') or request.headers.get('X-Timings')):
+        # Serialize time itself cannot be part of the block it is written into
+        payload = dict(payload, timings=trace.as_dict())
+    with stage("serialize"):
+        return transport.encode(payload, transport.negotiate(request.accept_mimetypes), status)
+
+def request_deadline(priority):
+    """Deadline budget in seconds: X-Request-Deadline-Ms header or the class default"""
+    default = app.config['INTERACTIVE_DEADLINE'] if priority == PRIORITIES.INTERACTIVE else app.config['BULK_DEADLINE']
+    try:
+        budget = float(request.headers.get('X-Request-Deadline-Ms', 0)) / 1000
+    except ValueError:
+        budget = 0
+    return min(budget, default) if budget > 0 else default
+
+def admin_authorized():
+    token = app.config['ADMIN_TOKEN']
+    return not token or request.headers.get('X-Admin-Token') == token
+
+def run_detector(image_path, roi=None, source=None):
+    """
+    Load an image and run the detection network (inference worker only).
+    With `roi` ([x, y, w, h]) only that region is fed to the network and the
+    boxes are mapped back to full-image coordinates.
+    Without `roi` the image is decoded at reduced resolution; boxes are in
+    the coordinates of the returned image, `scale` maps them to the file.
+    When `source` has static ROIs configured, each ROI is cropped and they
+    all go through the network as one batch.
+    `indexes` are the boxes kept by non-maximum suppression.
+    """
+    static_rois = roi_config.get(source)
+    if static_rois:
+        with stage("decode"):
+            image, scale = detector.load_image_reduced(image_path, roi_config.decode_target(source))
+        crops = [r.crop(image) for r in static_rois]
+        crops = [c for c in crops if c[0].size]
+        boxes, confidences, class_ids = [], [], []
+        if not crops:
+            return image, boxes, confidences, class_ids, [], scale
+        with stage("detect_forward"):
+            blob, outputs = detector.detect_plates_batch([crop for crop, _, _ in crops])
+        with stage("nms"):
+            for (crop, x, y), crop_outputs in zip(crops, outputs):
+                b, c, k = detector.get_boxes(crop_outputs, crop.shape[1], crop.shape[0], threshold=0.3)
+                boxes += [[bx + x, by + y, bw, bh] for bx, by, bw, bh in b]
+                confidences += c
+                class_ids += k
+            indexes = detector.keep(boxes, confidences)
+        return image, boxes, confidences, class_ids, indexes, scale
+    if roi is None:
+        with stage("decode"):
+            image, scale = detector.load_image_reduced(image_path)
+        height, width = image.shape[:2]
+        with stage("detect_forward"):
+            blob, outputs = detector.detect_plates(image)
+        with stage("nms"):
+            boxes, confidences, class_ids = detector.get_boxes(outputs, width, height, threshold=0.3)
+            indexes = detector.keep(boxes, confidences)
+        return image, boxes, confidences, class_ids, indexes, scale
+    with stage("decode"):
+        image, height, width, channels = detector.load_image(image_path)
+    x, y, w, h = roi
+    with stage("detect_forward"):
+        blob, outputs = detector.detect_plates(image[y:y+h, x:x+w])
+    with stage("nms"):
+        boxes, confidences, class_ids = detector.get_boxes(outputs, w, h, threshold=0.3)
+        indexes = detector.keep(boxes, confidences)
+    boxes = [[bx + x, by + y, bw, bh] for bx, by, bw, bh in boxes]
+    return image, boxes, confidences, class_ids, indexes, 1.0
+
+def draw_detections(image_path, image, boxes, confidences, class_ids, indexes, scale):
+    """
+    Annotate `image` with the boxes kept by NMS. Plate crops come from a second,
+    larger decode only when a box was found and is narrower than the 470 px crop in `image`.
+    """
+    with stage("crop"):
+        source, source_scale = None, 1.0
+        if indexes and scale != 1.0:
+            source, source_scale = detector.load_crop_source(image_path, image, [boxes[i] for i in indexes], scale)
+        return detector.draw_labels(boxes, confidences, class_ids, image, source=source, scale=scale,
+                                    source_scale=source_scale, indexes=indexes)
+
+def run_reader(image_path):
+    """Load a plate image and run the OCR network (inference worker only)"""
+    with stage("decode"):
+        image, height, width, channels = reader.load_image(image_path)
+    with stage("ocr_forward"):
+        blob, outputs = reader.read_plate(image)
+    with stage("nms"):
+        boxes, confidences, class_ids = reader.get_boxes(outputs, width, height, threshold=0.3)
+        indexes = reader.keep(boxes, confidences)
+    return image, boxes, confidences, class_ids, indexes
+
+def infer(priority, fn, *args):
+    """
+    Run `fn` through the admission-controlled inference queue, within what is
+    left of the request deadline (set once per request in before_request)
+    """
+    remaining = g.deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded", retry_after=scheduler.retry_after())
+    trace = current_trace()
+    queued = time.perf_counter()
+
+    def job():
+        # Runs on the inference worker, inside a copy of the request context
+        if trace is None:
+            return fn(*args)
+        trace.add("queue", (time.perf_counter() - queued) * 1000)
+        if trace.profiled:
+            profiler.attach(threading.get_ident())
+        try:
+            return fn(*args)
+        finally:
+            if trace.profiled:
+                profiler.detach(threading.get_ident())
+
+    return scheduler.run(priority, remaining, contextvars.copy_context().run, job)
+
+@app.before_request
+def begin_request_trace():
+    if request.endpoint not in INFERENCE_ENDPOINTS:
+        return
+    # One absolute deadline per request: receiving the upload and every infer() call share it
+    g.deadline = time.monotonic() + request_deadline(INFERENCE_ENDPOINTS[request.endpoint])
+    profiled = request.method == 'POST' and profiler.claim()
+    g.trace, g.trace_token = start_trace(profiled)
+    if profiled:
+        profiler.attach(threading.get_ident())
+
+@app.after_request
+def add_server_timing(response):
+    trace = g.get('trace')
+    if trace is not None:
+        response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+@app.teardown_request
+def finish_request_trace(exc):
+    trace = g.pop('trace', None)
+    if trace is None:
+        return
+    end_trace(g.pop('trace_token'))
+    if trace.profiled:
+        profiler.detach(threading.get_ident())
+        profiler.finish_request()
+
+@app.errorhandler(ServingError)
+def handle_serving_error(e):
+    response = jsonify({"error": type(e).__name__, "message": str(e)})
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 @app.route('/', methods=['GET'])
 def home():
     return '''<h1>Moroccan Plate Detection & Recognition API</h1>
@@ -95,7 +367,8 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "ok",
-        "message": "Moroccan Plate Detection & Recognition API is running"
+        "message": "Moroccan Plate Detection & Recognition API is running",
+        "inference": scheduler.stats()
     })
 
 @app.route('/detect', methods=['POST', 'GET'])
@@ -104,13 +377,21 @@ def detect_plate():
     Detect license plate in an image
     
     Expects:
-    - 'image': file upload or base64 encoded image
+    - 'image': file upload or base64 encoded image, or the raw image as the
+      request body (Content-Type: application/octet-stream or image/*)
+    - 'source' (optional, query): camera id; its static ROIs (ROI_CONFIG) are
+      the only regions fed to the detector
     
-    Returns:
-    - JSON with detection results including:
+    Returns (JSON by default; Accept: application/msgpack or multipart/mixed
+    return the same fields with raw JPEG bytes instead of base64):
+    - detection results including:
       - original_image: base64 encoded original image
-      - detection_image: base64 encoded image with plate box drawn
+      - detection_image: base64 encoded image with plate box drawn, at the
+        resolution it was decoded for detection (down to 1/8 of the upload
+        for baseline JPEGs; original_image keeps the full resolution)
       - plate_image: base64 encoded crop of the detected plate
+      - *_url / thumbnail_url: the same images served from /images/<hash>
+        (with ?images=url only the URLs are returned)
       - status: success or error message
     """
     # Handle incorrect method
@@ -120,19 +401,23 @@ def detect_plate():
             "message": "This endpoint requires a POST request with an image. See API documentation for details.",
             "expected_payload": {
                 "option1": "multipart/form-data with 'image' file field",
-                "option2": "application/json with 'image' field containing base64 encoded image"
+                "option2": "application/json with 'image' field containing base64 encoded image",
+                "option3": "application/octet-stream body with the raw image bytes"
             }
         }), 405
     try:
         image_path = None
         
+        # Raw image body
+        if is_raw_upload():
+            image_path = save_raw_image(request.stream)
         # Check if the request has a file part
-        if 'image' in request.files:
+        elif 'image' in request.files:
             file = request.files['image']
             if file.filename != '':
                 image_path = save_file_from_request(file)
         # Check if the request has base64 image
-        elif request.json and 'image' in request.json:
+        elif request.is_json and request.json and 'image' in request.json:
             image_path = save_base64_image(request.json['image'])
         else:
             return jsonify({"error": "No image provided"}), 400
@@ -141,40 +426,45 @@ def detect_plate():
             return jsonify({"error": "Failed to process image"}), 400
         
         # Detection
-        image, height, width, channels = detector.load_image(image_path)
-        blob, outputs = detector.detect_plates(image)
-        boxes, confidences, class_ids = detector.get_boxes(outputs, width, height, threshold=0.3)
-        plate_img, LpImg = detector.draw_labels(boxes, confidences, class_ids, image)
+        image, boxes, confidences, class_ids, indexes, scale = infer(PRIORITIES.INTERACTIVE, run_detector,
+                                                                     image_path, None, request.args.get('source'))
+        plate_img, LpImg = draw_detections(image_path, image, boxes, confidences, class_ids, indexes, scale)
         
         response = {
             "status": "success",
             "detection": []
         }
         
-        # Save result images
-        detection_file = os.path.join(app.config['UPLOAD_FOLDER'], "car_detection.jpg")
-        cv2.imwrite(detection_file, plate_img)
-        
-        # Add base image and detection image to response
-        response["original_image"] = base64_encode_image(image_path)
-        response["detection_image"] = base64_encode_image(detection_file)
+        # Add base image and detection image to response (inline unless ?images=url)
+        inline = inline_images()
+        original_image = read_image_bytes(image_path)
+        detection_image = encode_image(plate_img)
+        response["original_image_url"] = store_image(original_image)["url"]
+        detection_urls = store_image(detection_image, thumbnail=True)
+        response["detection_image_url"] = detection_urls["url"]
+        response["thumbnail_url"] = detection_urls["thumbnail_url"]
+        if inline:
+            response["original_image"] = original_image
+            response["detection_image"] = detection_image
         
         # Process detected plates
         if len(LpImg):
             for i, plate in enumerate(LpImg):
-                plate_file = os.path.join(app.config['UPLOAD_FOLDER'], f"plate_{i}.jpg")
-                cv2.imwrite(plate_file, plate)
-                
+                plate_image = encode_image(plate)
                 plate_data = {
                     "plate_index": i,
-                    "plate_image": base64_encode_image(plate_file)
+                    "plate_image_url": store_image(plate_image)["url"]
                 }
+                if inline:
+                    plate_data["plate_image"] = plate_image
                 response["detection"].append(plate_data)
         else:
             response["status"] = "no_plate_detected"
         
-        return jsonify(response)
+        return respond(response)
     
+    except (ServingError, HTTPException):
+        raise
     except Exception as e:
         app.logger.error(f"Error in plate detection: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -185,13 +475,21 @@ def read_plate():
     Perform OCR on license plate image
     
     Expects:
-    - 'plate_image': file upload or base64 encoded image of plate
-    - 'lang' (optional): language for OCR - 'eng' or 'ara'
+    - 'plate_image': file upload or base64 encoded image of plate, or the raw
+      image as the request body (Content-Type: application/octet-stream or image/*)
+    - 'lang' (optional): language for OCR - 'eng' or 'ara' (query string for raw bodies)
     
-    Returns:
-    - JSON with OCR results including:
+    Returns (JSON by default; Accept: application/msgpack or multipart/mixed
+    return the same fields with raw JPEG bytes instead of base64):
+    - OCR results including:
       - plate_text: recognized text from the plate
+      - confidence: mean confidence of the YOLO characters
+      - ocr_engine: 'yolo' or 'tesseract' (fallback used when YOLO is empty)
+      - fallback_text: tesseract result, when the fallback ran
+      - watchlist_hits: fuzzy watchlist matches, when any
       - segmented_image: base64 encoded image showing character segmentation
+      - segmented_image_url / thumbnail_url: served from /images/<hash>
+        (with ?images=url only the URLs are returned)
     """
     # Handle incorrect method
     if request.method == 'GET':
@@ -200,20 +498,28 @@ def read_plate():
             "message": "This endpoint requires a POST request with a plate image. See API documentation for details.",
             "expected_payload": {
                 "option1": "multipart/form-data with 'plate_image' file field and optional 'lang' field",
-                "option2": "application/json with 'plate_image' field containing base64 encoded image and optional 'lang' field"
+                "option2": "application/json with 'plate_image' field containing base64 encoded image and optional 'lang' field",
+                "option3": "application/octet-stream body with the raw plate image and optional '?lang=' query"
             }
         }), 405
     try:
+        started = time.perf_counter()
         image_path = None
-        lang = request.form.get('lang', 'eng') if request.form else request.json.get('lang', 'eng') if request.json else 'eng'
+        if is_raw_upload():
+            lang = request.args.get('lang', 'eng')
+        else:
+            lang = request.form.get('lang', 'eng') if request.form else request.json.get('lang', 'eng') if request.is_json and request.json else 'eng'
         
+        # Raw image body
+        if is_raw_upload():
+            image_path = save_raw_image(request.stream, prefix="plate")
         # Check if the request has a file part
-        if 'plate_image' in request.files:
+        elif 'plate_image' in request.files:
             file = request.files['plate_image']
             if file.filename != '':
                 image_path = save_file_from_request(file)
         # Check if the request has base64 image
-        elif request.json and 'plate_image' in request.json:
+        elif request.is_json and request.json and 'plate_image' in request.json:
             image_path = save_base64_image(request.json['plate_image'], prefix="plate")
         else:
             return jsonify({"error": "No plate image provided"}), 400
@@ -222,20 +528,40 @@ def read_plate():
             return jsonify({"error": "Failed to process plate image"}), 400
         
         # OCR
-        image, height, width, channels = reader.load_image(image_path)
-        blob, outputs = reader.read_plate(image)
-        boxes, confidences, class_ids = reader.get_boxes(outputs, width, height, threshold=0.3)
-        segmented, plate_text = reader.draw_labels(boxes, confidences, class_ids, image)
+        image, boxes, confidences, class_ids, indexes = infer(PRIORITIES.INTERACTIVE, run_reader, image_path)
+        confidence = reader.plate_confidence(boxes, confidences, indexes)
         
-        # If no text detected with YOLO, try tesseract if requested
-        if not plate_text and lang:
+        # If YOLO found nothing or is unsure, start tesseract on the clean image
+        # (draw_labels draws on it) while the segmented output is rendered
+        fallback = None
+        if lang and confidence < app.config['OCR_FALLBACK_CONFIDENCE']:
+            fallback = tesseract_pool.submit(image, lang=lang)
+            if fallback is None:
+                app.logger.info("Tesseract pool saturated, skipping OCR fallback")
+        
+        with stage("assemble"):
+            segmented, plate_text = reader.draw_labels(boxes, confidences, class_ids, image, indexes)
+        
+        segmented_image = encode_image(segmented)
+        segmented_urls = store_image(segmented_image, thumbnail=True)
+        
+        ocr_engine = "yolo"
+        fallback_text = ""
+        if fallback is not None:
             try:
-                # import pytesseract # Commented out due to potential import issues
-                # plate_text = pytesseract.image_to_string(image, lang=lang) # Commented out
-                # plate_text = plate_text.strip() # Commented out
-                app.logger.info("Pytesseract OCR fallback is currently commented out.") # Added info
+                fallback_text = tesseract_pool.result(fallback)
             except Exception as e:
                 app.logger.warning(f"Tesseract OCR failed: {str(e)}")
+            if fallback_text and not plate_text:
+                plate_text = fallback_text
+                ocr_engine = "tesseract"
+        
+        log_recognition(plate_text, confidence, started, 'image')
+        
+        # Watchlist check on the raw text (before Arabic reshaping)
+        watchlist_hits = watchlist.match(plate_text, app.config['WATCHLIST_MAX_DISTANCE']) if plate_text else []
+        if watchlist_hits:
+            app.logger.warning(f"Watchlist hit for plate {plate_text!r}: {[hit['key'] for hit in watchlist_hits]}")
         
         # Format text with arabic reshaper if needed
         if plate_text and lang == 'ara':
@@ -245,18 +571,25 @@ def read_plate():
             except Exception as e:
                 app.logger.warning(f"Arabic text formatting failed: {str(e)}")
         
-        # Save segmented image
-        segmented_file = os.path.join(app.config['UPLOAD_FOLDER'], "plate_segmented.jpg")
-        cv2.imwrite(segmented_file, segmented)
-        
         response = {
             "status": "success",
             "plate_text": plate_text if plate_text else "",
-            "segmented_image": base64_encode_image(segmented_file)
+            "confidence": confidence,
+            "ocr_engine": ocr_engine,
+            "segmented_image_url": segmented_urls["url"],
+            "thumbnail_url": segmented_urls["thumbnail_url"]
         }
+        if inline_images():
+            response["segmented_image"] = segmented_image
+        if fallback_text:
+            response["fallback_text"] = fallback_text
+        if watchlist_hits:
+            response["watchlist_hits"] = watchlist_hits
         
-        return jsonify(response)
+        return respond(response)
     
+    except (ServingError, HTTPException):
+        raise
     except Exception as e:
         app.logger.error(f"Error in OCR: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -269,32 +602,34 @@ def upload_image():
         if 'image' not in request.files:
             return jsonify({"error": "No image provided"}), 400
 
+        started = time.perf_counter()
         uploaded_image = request.files['image']
         image_path = save_file_from_request(uploaded_image)
         
         # Detection
-        image, height, width, channels = detector.load_image(image_path)
-        blob, outputs = detector.detect_plates(image)
-        boxes, confidences, class_ids = detector.get_boxes(outputs, width, height, threshold=0.3)
-        plate_img, LpImg = detector.draw_labels(boxes, confidences, class_ids, image)
+        image, boxes, confidences, class_ids, indexes, scale = infer(PRIORITIES.BULK, run_detector, image_path,
+                                                                     None, request.args.get('source'))
+        plate_img, LpImg = draw_detections(image_path, image, boxes, confidences, class_ids, indexes, scale)
         
         plate_text = ""
         if len(LpImg):
-            cv2.imwrite('./tmp/car_box.jpg', plate_img)
-            cv2.imwrite('./tmp/plate_box.jpg', LpImg[0])
+            # Content-addressed files: concurrent uploads cannot overwrite each other
+            plate_digest = image_store.put(encode_image(LpImg[0]))
             
             # OCR
-            image, height, width, channels = reader.load_image('./tmp/plate_box.jpg')
-            blob, outputs = reader.read_plate(image)
-            boxes, confidences, class_ids = reader.get_boxes(outputs, width, height, threshold=0.3)
-            segmented, plate_text = reader.draw_labels(boxes, confidences, class_ids, image)
-            cv2.imwrite('./tmp/plate_segmented.jpg', segmented)
+            image, boxes, confidences, class_ids, indexes = infer(PRIORITIES.BULK, run_reader,
+                                                                  image_store.path(plate_digest))
+            with stage("assemble"):
+                _, plate_text = reader.draw_labels(boxes, confidences, class_ids, image, indexes)
+            log_recognition(plate_text, reader.plate_confidence(boxes, confidences, indexes), started, 'upload')
             
             # Format text with arabic reshaper if needed
             if plate_text:
                 plate_text = arabic_reshaper.reshape(plate_text)
         
         return jsonify({"result": plate_text if plate_text else "No plate detected"})
+    except (ServingError, HTTPException):
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -406,6 +741,148 @@ def get_model_metrics_api(): # Renamed function to avoid conflict if old one is
 
     return jsonify(metrics_data)
 
+@app.route('/api/watchlist', methods=['POST'])
+def add_watchlist_plates():
+    """
+    Add plates to the watchlist (admin token required).
+    Behind gateway.py the change is sent to every worker.
+    Expects JSON: {"plates": [{"plate": "12345 | ب | 6", "list": "stolen", "note": "..."}]}
+    or a single {"plate": ..., "list": ...}
+    """
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    payload = request.get_json(silent=True) or {}
+    items = payload.get('plates', [payload] if 'plate' in payload else [])
+    if not items:
+        return jsonify({"error": "No plate provided"}), 400
+    added = []
+    for item in items:
+        info = {k: v for k, v in item.items() if k != 'plate'}
+        info.setdefault('list', 'default')
+        try:
+            added.append(watchlist.add(str(item.get('plate', '')), **info))
+        except ValueError as e:
+            return jsonify({"error": str(e), "added": added}), 400
+    return jsonify({"status": "success", "added": added, "size": len(watchlist)})
+
+@app.route('/api/watchlist', methods=['GET'])
+def get_watchlist_snapshot():
+    """Every watchlist entry (admin token required); gateway.py syncs recovering workers with it"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"plates": watchlist.entries(), "size": len(watchlist)})
+
+@app.route('/api/watchlist', methods=['PUT'])
+def replace_watchlist():
+    """
+    Replace the whole watchlist (admin token required).
+    Expects JSON: {"plates": [...]} as returned by GET /api/watchlist
+    """
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload.get('plates'), list):
+        return jsonify({"error": "Expected {\"plates\": [...]}"}), 400
+    try:
+        size = watchlist.replace(payload['plates'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "success", "size": size})
+
+@app.route('/api/watchlist/<path:plate>', methods=['DELETE'])
+def remove_watchlist_plate(plate):
+    """Remove a plate (all its entries) from the watchlist (admin token required)"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    if not watchlist.remove(plate):
+        return jsonify({"error": "Plate not in watchlist"}), 404
+    return jsonify({"status": "success", "size": len(watchlist)})
+
+@app.route('/api/watchlist/match', methods=['GET'])
+def match_watchlist_plate():
+    """Fuzzy lookup: ?plate=...&max_distance=1.0"""
+    plate = request.args.get('plate', '')
+    try:
+        max_distance = float(request.args.get('max_distance', app.config['WATCHLIST_MAX_DISTANCE']))
+        hits = watchlist.match(plate, max_distance)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"plate": plate, "hits": hits})
+
+def send_stored_image(digest, thumbnail):
+    try:
+        path = image_store.path(digest, thumbnail)
+    except ValueError:
+        return jsonify({"error": "Invalid image hash"}), 400
+    if not os.path.exists(path):
+        return jsonify({"error": "Image not found"}), 404
+    image_store.touch(digest)
+    # Content never changes for a given hash: the hash is the ETag and caches may keep it forever
+    response = send_file(path, mimetype='image/jpeg', etag=digest + ('-thumb' if thumbnail else ''),
+                         conditional=True, max_age=365 * 24 * 3600)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/images/<digest>', methods=['GET'])
+def get_image(digest):
+    """Stored result image by content hash"""
+    return send_stored_image(digest, thumbnail=False)
+
+@app.route('/images/<digest>/thumb', methods=['GET'])
+def get_image_thumbnail(digest):
+    """Thumbnail generated when the image was stored"""
+    return send_stored_image(digest, thumbnail=True)
+
+@app.route('/api/export', methods=['GET'])
+def export_history():
+    """
+    Stream the recognition log for a time range without loading it in memory
+    (admin token required).
+    Query: start, end (ISO timestamps, end exclusive), format=parquet|arrow|csv
+    Only this process' DETECTION_LOG_DB is read: behind gateway.py the workers
+    must share one DB path (spawned workers do), otherwise export each worker.
+    """
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    fmt = request.args.get('format', 'parquet')
+    mimetypes = {'parquet': 'application/vnd.apache.parquet',
+                 'arrow': 'application/vnd.apache.arrow.stream',
+                 'csv': 'text/csv'}
+    if fmt not in mimetypes:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    if fmt != 'csv' and export.pa is None:
+        return jsonify({"error": "pyarrow is not installed; use format=csv"}), 501
+    start, end = request.args.get('start'), request.args.get('end')
+    label = "".join(c if c.isalnum() else '-' for c in f"{start or 'begin'}_{end or 'now'}")
+    filename = f"detections_{label}.{fmt}"
+    chunks = export.stream_export(detection_log, start, end, fmt)
+    return Response(stream_with_context(chunks), mimetype=mimetypes[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/admin/profile', methods=['POST', 'GET'])
+def admin_profile():
+    """
+    POST ?requests=N[&interval_ms=5]: sample the next N inference requests.
+    GET: profiler status, or the collapsed stacks (flamegraph.pl / speedscope
+    input) with ?format=collapsed.
+    """
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == 'POST':
+        try:
+            count = int(request.args.get('requests', 10))
+            interval = float(request.args.get('interval_ms', 5)) / 1000
+        except ValueError:
+            return jsonify({"error": "requests and interval_ms must be numbers"}), 400
+        if count <= 0 or interval <= 0:
+            return jsonify({"error": "requests and interval_ms must be positive"}), 400
+        profiler.arm(count, interval)
+        return jsonify({"status": "armed", "profile": profiler.status()})
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    return jsonify(profiler.status())
+
 @app.route('/upload_video', methods=['POST'])
 def upload_video():
     """
@@ -415,12 +892,14 @@ def upload_video():
     Returns:
     - JSON with detection results (first frame with plate, or summary)
     """
+    cap = None
     try:
         if 'video' not in request.files:
             return jsonify({'status': 'error', 'message': 'No video file provided'}), 400
         video_file = request.files['video']
         video_path = save_file_from_request(video_file)
         cap = cv2.VideoCapture(video_path)
+        gate = FrameGate()
         frame_count = 0
         detection_image = None
         original_image = None
@@ -434,35 +913,60 @@ def upload_video():
             # Process every N frames or all (for demo, every 10th frame)
             if frame_count % 10 != 1:
                 continue
-            # Save temp frame
-            temp_frame_path = os.path.join(app.config['UPLOAD_FOLDER'], f"video_frame_{frame_count}.jpg")
-            cv2.imwrite(temp_frame_path, frame)
-            # Detection
-            image, height, width, channels = detector.load_image(temp_frame_path)
-            blob, outputs = detector.detect_plates(image)
-            boxes, confidences, class_ids = detector.get_boxes(outputs, width, height, threshold=0.3)
-            plate_img, LpImg = detector.draw_labels(boxes, confidences, class_ids, image)
+            # Skip static / near-identical frames before paying for a forward pass
+            changed, rois = gate.check(frame)
+            if not changed:
+                continue
+            # Feed only the moving region when it is small enough to gain resolution
+            roi = union_roi(rois) if rois else None
+            if roi and roi[2] * roi[3] > 0.6 * frame.shape[0] * frame.shape[1]:
+                roi = None
+            # Save temp frame (unique name: concurrent uploads cannot overwrite each other's frames)
+            frame_image = encode_image(frame)
+            fd, temp_frame_path = tempfile.mkstemp(prefix="video_frame", suffix=".jpg",
+                                                   dir=app.config['UPLOAD_FOLDER'])
+            with os.fdopen(fd, 'wb') as f:
+                f.write(frame_image)
+            try:
+                # Detection
+                # One bulk job per frame so interactive requests can interleave
+                # Static ROIs of the camera, when configured, replace the motion region
+                image, boxes, confidences, class_ids, indexes, scale = infer(PRIORITIES.BULK, run_detector,
+                                                                             temp_frame_path, roi,
+                                                                             request.args.get('source'))
+                plate_img, LpImg = draw_detections(temp_frame_path, image, boxes, confidences, class_ids,
+                                                   indexes, scale)
+            finally:
+                os.remove(temp_frame_path)
             if len(LpImg):
-                # Save annotated frame and first plate(s)
-                detection_file = os.path.join(app.config['UPLOAD_FOLDER'], f"video_detection_{frame_count}.jpg")
-                cv2.imwrite(detection_file, plate_img)
-                detection_image = base64_encode_image(detection_file)
-                original_image = base64_encode_image(temp_frame_path)
+                # Encode annotated frame and first plate(s)
+                detection_image = encode_image(plate_img)
+                original_image = frame_image
+                detection_urls = store_image(detection_image, thumbnail=True)
+                original_image_url = store_image(original_image)["url"]
                 for i, plate in enumerate(LpImg):
-                    plate_file = os.path.join(app.config['UPLOAD_FOLDER'], f"video_plate_{frame_count}_{i}.jpg")
-                    cv2.imwrite(plate_file, plate)
-                    plate_images.append(base64_encode_image(plate_file))
+                    plate_images.append(encode_image(plate))
+                plate_image_urls = [store_image(plate)["url"] for plate in plate_images]
                 found = True
                 break  # Stop at first detection for demo
         cap.release()
         if not found:
-            return jsonify({'status': 'no_plate_detected'}), 200
-        return jsonify({
+            return jsonify({'status': 'no_plate_detected', 'frames': gate.stats()}), 200
+        return respond({
             'status': 'success',
             'detection_image': detection_image,
             'original_image': original_image,
-            'plate_images': plate_images
+            'plate_images': plate_images,
+            'detection_image_url': detection_urls['url'],
+            'original_image_url': original_image_url,
+            'thumbnail_url': detection_urls['thumbnail_url'],
+            'plate_image_urls': plate_image_urls,
+            'frames': gate.stats()
         })
+    except (ServingError, HTTPException):
+        if cap is not None:
+            cap.release()
+        raise
     except Exception as e:
         app.logger.error(f"Error in video upload: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Per-thread buffer arena: reusable arrays for blobs, crops and resizes in hot loops
+
+import threading
+
+import cv2
+import numpy as np
+
+
+class BufferArena:
+    """
+    Hand out preallocated numpy arrays keyed by (name, shape, dtype), one set per thread.
+
+    A buffer is only valid until the same thread asks for the same key again,
+    which is why each worker/request thread owns its own arena: the inference
+    worker reuses its blob tensors job after job, and an HTTP thread reuses its
+    crop buffers request after request.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        buf = buffers.get(key)
+        if buf is None:
+            buf = buffers[key] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def blob(self, name, batch, size):
+        """NCHW float32 input tensor for `batch` images of `size` (w, h)"""
+        return self.get(name + ":blob", (batch, 3, size[1], size[0]), np.float32)
+
+    def fill_blob(self, blob, index, img, scalefactor, size):
+        """
+        Same as cv2.dnn.blobFromImage(img, scalefactor, size, (0, 0, 0), swapRB=True,
+        crop=False) for one image, written into blob[index] without new allocations
+        """
+        name = "blob-resize"
+        resized = cv2.resize(img, size, dst=self.get(name, (size[1], size[0], 3)), interpolation=cv2.INTER_LINEAR)
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=self.get(name + "-rgb", (size[1], size[0], 3)))
+        np.multiply(rgb.transpose(2, 0, 1), scalefactor, out=blob[index])
+        return blob
+
+    def resize(self, name, img, dsize):
+        """cv2.resize into an arena buffer of `dsize` (w, h)"""
+        shape = (dsize[1], dsize[0]) + img.shape[2:]
+        return cv2.resize(img, dsize, dst=self.get(name, shape, img.dtype))
+
+
+# Shared by the detector and reader; buffers are still per thread
+arena = BufferArena()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# HTTP load generator / latency benchmark for the plate API
+#
+#   python benchmark.py --endpoint detect --concurrency 8 --requests 200
+#   python benchmark.py --endpoint ocr --rate 5 --duration 60 --images ./tmp/plate_*.jpg
+#   python benchmark.py --endpoint detect --transport raw --accept application/msgpack -o after.json
+#   python benchmark.py --compare before.json after.json
+#
+# Closed loop (--concurrency): N clients send back to back.
+# Open loop (--rate): Poisson arrivals at R req/s regardless of responses;
+# latency is measured from the scheduled send time, so a slow server is not
+# hidden by the generator slowing down (coordinated omission).
+
+import argparse
+import base64
+import glob
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+# endpoint -> (path, form/json field name)
+ENDPOINTS = {
+    "detect": ("/detect", "image"),
+    "ocr": ("/ocr", "plate_image"),
+    "upload": ("/upload", "image"),
+}
+
+
+def load_corpus(patterns):
+    paths = sorted({p for pattern in patterns for p in glob.glob(pattern)})
+    if not paths:
+        raise SystemExit(f"No images match {patterns}")
+    corpus = []
+    for path in paths:
+        with open(path, "rb") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def build_request(endpoint, transport, name, data):
+    """Keyword arguments for requests.post for one image"""
+    path, field = ENDPOINTS.get(endpoint, (endpoint, "image"))
+    if transport == "json":
+        body = json.dumps({field: base64.b64encode(data).decode("utf-8")}).encode("utf-8")
+        return path, {"data": body, "headers": {"Content-Type": "application/json"}}, len(body)
+    if transport == "raw":
+        return path, {"data": data, "headers": {"Content-Type": "application/octet-stream"}}, len(data)
+    return path, {"files": {field: (name, data, "image/jpeg")}}, len(data)
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, latency, status, sent, received):
+        with self._lock:
+            self.samples.append((latency, status, sent, received))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(s[0] * 1000 for s in samples)
+    ok = [s for s in samples if 200 <= s[1] < 300]
+    statuses = {}
+    for s in samples:
+        statuses[str(s[1])] = statuses.get(str(s[1]), 0) + 1
+    n = len(samples)
+    return {
+        "requests": n,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0,
+        "error_rate": round(1 - len(ok) / n, 4) if n else 0,
+        "status_codes": statuses,
+        "latency_ms": {
+            "mean": round(sum(latencies) / n, 2) if n else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "request_bytes_mean": round(sum(s[2] for s in samples) / n, 1) if n else 0,
+        "response_bytes_mean": round(sum(s[3] for s in samples) / n, 1) if n else 0,
+    }
+
+
+def run(args):
+    corpus = load_corpus(args.images)
+    session_local = threading.local()
+    recorder = Recorder()
+    headers = {"Accept": args.accept}
+    if args.deadline_ms:
+        headers["X-Request-Deadline-Ms"] = str(args.deadline_ms)
+
+    def send(i, scheduled=None):
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        name, data = corpus[i % len(corpus)]
+        path, kwargs, sent = build_request(args.endpoint, args.transport, name, data)
+        kwargs["headers"] = dict(kwargs.get("headers", {}), **headers)
+        start = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            r = session.post(args.url.rstrip("/") + path, timeout=args.timeout, **kwargs)
+            status, received = r.status_code, len(r.content)
+        except requests.RequestException:
+            status, received = 0, 0
+        recorder.add(time.perf_counter() - start, status, sent, received)
+
+    # Warm-up requests are not recorded
+    for i in range(args.warmup):
+        send(i)
+    recorder.samples.clear()
+
+    begin = time.perf_counter()
+    if args.rate:
+        total = int(args.rate * args.duration)
+        with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+            next_at = begin
+            for i in range(total):
+                next_at += random.expovariate(args.rate)
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, i, next_at)
+    else:
+        counter = iter(range(args.requests))
+        lock = threading.Lock()
+
+        def client():
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                send(i)
+
+        threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - begin
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "url": args.url, "endpoint": args.endpoint, "transport": args.transport,
+            "accept": args.accept, "mode": "open" if args.rate else "closed",
+            "rate": args.rate, "duration": args.duration if args.rate else None,
+            "concurrency": None if args.rate else args.concurrency,
+            "images": len(corpus),
+        },
+        "results": summarize(recorder.samples, elapsed),
+    }
+
+
+def print_report(report):
+    config, results = report["config"], report["results"]
+    print(f"{config['endpoint']} ({config['mode']} loop, {config['transport']} -> {config['accept']})")
+    print(f"  requests     {results['requests']}  errors {results['error_rate'] * 100:.2f}%  {results['status_codes']}")
+    print(f"  throughput   {results['throughput_rps']:.2f} req/s")
+    lat = results["latency_ms"]
+    if lat["p50"] is not None:
+        print(f"  latency ms   p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+    print(f"  payload      sent {results['request_bytes_mean']:.0f} B  received {results['response_bytes_mean']:.0f} B (mean)")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)["results"]
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+    rows = [("throughput_rps", before["throughput_rps"], after["throughput_rps"]),
+            ("error_rate", before["error_rate"], after["error_rate"]),
+            ("response_bytes_mean", before["response_bytes_mean"], after["response_bytes_mean"])]
+    rows += [(f"latency_{k}_ms", before["latency_ms"][k], after["latency_ms"][k]) for k in ("p50", "p95", "p99")]
+    for name, b, a in rows:
+        if b is None or a is None:
+            continue
+        change = f"{(a - b) / b * 100:+.1f}%" if b else "n/a"
+        print(f"{name:22s} {b:12.2f} -> {a:12.2f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the plate API")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--endpoint", default="detect", help="detect, ocr, upload or a raw path")
+    parser.add_argument("--images", nargs="+", default=["./test_images/*.jpg"])
+    parser.add_argument("--transport", choices=["multipart", "json", "raw"], default="multipart")
+    parser.add_argument("--accept", default="application/json")
+    parser.add_argument("--concurrency", type=int, default=4, help="closed loop clients")
+    parser.add_argument("--requests", type=int, default=100, help="closed loop total requests")
+    parser.add_argument("--rate", type=float, help="open loop arrivals per second")
+    parser.add_argument("--duration", type=float, default=30, help="open loop duration (s)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open loop sender threads")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--deadline-ms", type=int, help="send X-Request-Deadline-Ms")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,94 @@ import cv2
 import pytesseract
 import numpy as np
 import glob
+from arena import arena
+from utility import PerThread
+from PIL import Image
+
+# cv2 flags decoding JPEGs directly at 1/2, 1/4 and 1/8 scale (DCT scaling, no full decode)
+REDUCED_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+# Plate crops may be upscaled this much to 470x110 before a larger decode is worth it
+MAX_CROP_UPSCALE = 2
 
 class PlateDetector:
     def load_model(self, weight_path: str, cfg_path: str):
-        self.net = cv2.dnn.readNet(weight_path, cfg_path)
+        net = cv2.dnn.readNet(weight_path, cfg_path)
+        # cv2.dnn nets are not thread safe: every inference worker thread gets its own
+        # (this one goes to the first), so INFERENCE_WORKERS > 1 runs them in parallel
+        self._nets = PerThread(lambda: cv2.dnn.readNet(weight_path, cfg_path), first=net)
         with open("classes-detection.names", "r") as f:
             self.classes = [line.strip() for line in f.readlines()]
-        self.layers_names = self.net.getLayerNames()
+        self.layers_names = net.getLayerNames()
         # Fix for IndexError: invalid index to scalar variable
-        self.output_layers = [self.layers_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
+        self.output_layers = [self.layers_names[i - 1] for i in net.getUnconnectedOutLayers()]
+
+    @property
+    def net(self):
+        return self._nets.get()
 
     def load_image(self, img_path):
         img = cv2.imread(img_path)
         height, width, channels = img.shape
         return img, height, width, channels
 
+    def load_image_reduced(self, img_path, target_size=320):
+        # decode at the smallest 1/2^k scale whose short side still covers the network input
+        try:
+            with Image.open(img_path) as header:  # only reads the header
+                full_w, full_h = header.size
+                progressive = bool(header.info.get("progressive"))
+        except Exception:
+            full_w = full_h = 0
+            progressive = False
+        img = None
+        for factor, flag in REDUCED_FLAGS:
+            # progressive JPEGs entropy-decode every scan at any scale: a reduced decode saves
+            # little there and a later crop decode would cost more than one full decode
+            if not progressive and min(full_w, full_h) // factor >= target_size:
+                img = cv2.imread(img_path, flag)
+                break
+        if img is None:
+            img = cv2.imread(img_path)
+            return img, 1.0
+        # max side is unaffected by EXIF rotation
+        scale = max(full_w, full_h) / float(max(img.shape[:2]))
+        return img, scale
+
+    def load_crop_source(self, img_path, img, boxes, scale, crop_width=470):
+        # image to cut plate crops from: the least decoded resolution where the
+        # narrowest box spans at least crop_width / MAX_CROP_UPSCALE pixels (crops
+        # are resized to crop_width; a 2x upscale barely shows, a second decode does)
+        # returns (source, source_scale); source_scale maps img coordinates to source
+        narrowest = min(w for _, _, w, _ in boxes) * scale
+        min_width = crop_width / MAX_CROP_UPSCALE
+        if narrowest / scale >= min_width or scale == 1.0:
+            return img, 1.0
+        for factor, flag in REDUCED_FLAGS:
+            if factor < round(scale) and narrowest / factor >= min_width:
+                source = cv2.imread(img_path, flag)
+                break
+        else:
+            source = cv2.imread(img_path)
+        return source, max(source.shape[:2]) / float(max(img.shape[:2]))
+
     def detect_plates(self, img):
-        blob = cv2.dnn.blobFromImage(img, scalefactor=0.00392, size=(320, 320), mean=(0, 0, 0), swapRB=True, crop=False)
+        # Same as blobFromImage, but written into this thread's reusable tensor
+        blob = arena.fill_blob(arena.blob("detect", 1, (320, 320)), 0, img, 0.00392, (320, 320))
         self.net.setInput(blob)
         outputs = self.net.forward(self.output_layers)
         return blob, outputs
         
+    def detect_plates_batch(self, imgs):
+        # one forward pass for several crops (ROIs); returns the outputs of each image
+        blob = arena.blob("detect", len(imgs), (320, 320))
+        for i, img in enumerate(imgs):
+            arena.fill_blob(blob, i, img, 0.00392, (320, 320))
+        self.net.setInput(blob)
+        outputs = self.net.forward(self.output_layers)
+        # YOLO layers stack the detections of the batch along the first axis
+        split = [output.reshape(len(imgs), -1, output.shape[-1]) for output in outputs]
+        return blob, [[output[i] for output in split] for i in range(len(imgs))]
+
     def get_boxes(self, outputs, width, height, threshold=0.3):
         boxes = []
         confidences = []
@@ -44,8 +111,15 @@ class PlateDetector:
                     class_ids.append(class_id)      
         return boxes, confidences, class_ids
 
-    def draw_labels(self, boxes, confidences, class_ids, img):
-        indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.1, 0.1)
+    def keep(self, boxes, confidences):
+        # indexes of the boxes left after non-maximum suppression
+        return [int(i) for i in np.array(cv2.dnn.NMSBoxes(boxes, confidences, 0.1, 0.1)).flatten()]
+
+    def draw_labels(self, boxes, confidences, class_ids, img, source=None, scale=1.0, source_scale=1.0, indexes=None):
+        # source: larger decode to crop plates from when img was decoded reduced (boxes * source_scale);
+        # scale (img to file) only sizes the drawn lines; indexes: result of keep() when already known
+        if indexes is None:
+            indexes = self.keep(boxes, confidences)
         font = cv2.FONT_HERSHEY_PLAIN
         plats = []
         for i in range(len(boxes)):
@@ -53,13 +127,18 @@ class PlateDetector:
                 x, y, w, h = boxes[i]
                 label = str(self.classes[class_ids[i]])
                 color_green = (0, 255, 0)
-                crop_img = img[y:y+h, x:x+w]
+                if source is not None:
+                    sx, sy, sw, sh = [int(round(v * source_scale)) for v in (x, y, w, h)]
+                    crop_img = source[max(sy, 0):sy+sh, max(sx, 0):sx+sw]
+                else:
+                    crop_img = img[y:y+h, x:x+w]
                 try:
-                    crop_resized = cv2.resize(crop_img, dsize=(470, 110))
+                    # Reused per-thread buffer: valid until this thread's next draw_labels
+                    crop_resized = arena.resize(("plate", len(plats)), crop_img, (470, 110))
                     plats.append(crop_resized)
-                    cv2.rectangle(img, (x, y), (x + w, y + h), color_green, 8)
+                    cv2.rectangle(img, (x, y), (x + w, y + h), color_green, max(1, int(8 / scale)))
                     confidence = round(confidences[i], 3) * 100
-                    cv2.putText(img, str(confidence) + "%", (x + 20, y - 20), font, 12, (0, 255, 0), 6)
+                    cv2.putText(img, str(confidence) + "%", (x + 20, y - 20), font, max(1, int(12 / scale)), (0, 255, 0), max(1, int(6 / scale)))
                 except cv2.error as err:
                     print(err)
 
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Columnar export of the recognition log (Parquet / Arrow) for analytics
+#
+#   python export.py --db ./detection_logs.db --out ./exports
+#
+# Each run appends only the rows added since the previous run (watermark on
+# the row id) as Parquet files partitioned Hive-style:
+#   exports/day=2025-06-23/source_type=video/part-00000101-00000250.parquet
+
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from recognition_log import COLUMNS, DetectionLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+WATERMARK_FILE = "_watermark.json"
+
+# Fixed schema, so a chunk where a column happens to be all NULL keeps its type
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("plate_number", pa.string()),
+    ("source_type", pa.string()),
+    ("confidence", pa.float64()),
+    ("processing_time", pa.int64()),
+    ("timestamp", pa.timestamp("ns")),
+]) if pa is not None else None
+# Files under source_type=... directories leave that column to the path
+PARTITION_SCHEMA = SCHEMA.remove(SCHEMA.get_field_index("source_type")) if pa is not None else None
+
+
+def rows_to_frame(rows):
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df["source_type"] = df["source_type"].fillna("unknown")
+    return df
+
+
+def _read_watermark(out_dir):
+    try:
+        with open(os.path.join(out_dir, WATERMARK_FILE)) as f:
+            return json.load(f).get("last_id", 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_watermark(out_dir, last_id):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"last_id": int(last_id)}, f)
+    os.replace(path + ".tmp", path)
+
+
+def export_incremental(log, out_dir, chunk_size=50000):
+    """Write rows newer than the watermark as partitioned Parquet; returns the number of rows"""
+    os.makedirs(out_dir, exist_ok=True)
+    last_id = _read_watermark(out_dir)
+    exported = 0
+    for rows in log.iter_chunks(after_id=last_id, chunk_size=chunk_size):
+        df = rows_to_frame(rows)
+        day = df["timestamp"].dt.strftime("%Y-%m-%d").fillna("unknown")
+        for (partition_day, source_type), part in df.groupby([day, df["source_type"]]):
+            # source_type is a user-supplied label; keep it a single safe path segment
+            safe_source = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(source_type))
+            directory = os.path.join(out_dir, f"day={partition_day}", f"source_type={safe_source}")
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{part['id'].min():08d}-{part['id'].max():08d}.parquet"
+            part.drop(columns=["source_type"]).to_parquet(os.path.join(directory, name), index=False,
+                                                          schema=PARTITION_SCHEMA)
+        # Advance only after the whole chunk is on disk, so a crash re-exports instead of skipping
+        last_id = int(df["id"].max())
+        _write_watermark(out_dir, last_id)
+        exported += len(df)
+    return exported
+
+
+class _ChunkSink:
+    """Minimal writable file for pyarrow that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_export(log, start=None, end=None, fmt="parquet", chunk_size=10000):
+    """
+    Yield the encoded rows of [start, end) chunk by chunk, holding at most
+    `chunk_size` rows in memory. Formats: parquet (one row group per chunk),
+    arrow (IPC stream) and csv (no pyarrow needed).
+    """
+    if fmt == "csv":
+        header = True
+        for rows in log.iter_chunks(start, end, chunk_size=chunk_size):
+            yield rows_to_frame(rows).to_csv(index=False, header=header)
+            header = False
+        return
+
+    if pa is None:
+        raise RuntimeError("pyarrow is required for parquet/arrow export")
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, SCHEMA) if fmt == "parquet" else pa.ipc.new_stream(sink, SCHEMA)
+    for rows in log.iter_chunks(start, end, chunk_size=chunk_size):
+        writer.write_table(pa.Table.from_pandas(rows_to_frame(rows), schema=SCHEMA, preserve_index=False))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental Parquet export of detection_logs")
+    parser.add_argument("--db", default="./detection_logs.db")
+    parser.add_argument("--out", default="./exports")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+    count = export_incremental(DetectionLog(args.db), args.out, args.chunk_size)
+    print(f"Exported {count} new rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Cheap pre-inference gate for video/stream frames: motion + near-duplicate detection
+
+import cv2
+import numpy as np
+
+
+def dhash(gray, hash_size=16):
+    """Difference hash of a grayscale image as a flat boolean array"""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).flatten()
+
+
+class FrameGate:
+    """
+    Decide per frame whether the detector needs to run.
+
+    Frames are downscaled to `width` pixels wide, blurred, and compared with a
+    running-average background. A frame is skipped when almost nothing moved
+    (`min_motion` fraction of pixels), or when the region that moved is a near
+    duplicate (dHash distance <= `dup_bits`) of the same region in the last
+    frame sent to the detector, e.g. a parked car under flickering light. The
+    hash covers only the moving region: a whole-frame hash barely changes when
+    a car enters the lane. Otherwise the motion regions are returned in
+    full-frame coordinates as candidate ROIs.
+    """
+
+    def __init__(self, width=160, min_motion=0.002, dup_bits=6, alpha=0.05, diff_threshold=25, margin=0.25):
+        self.width = width
+        self.min_motion = min_motion
+        self.dup_bits = dup_bits
+        self.alpha = alpha
+        self.diff_threshold = diff_threshold
+        self.margin = margin
+        self._background = None
+        self._last_inferred = None  # downscaled frame last sent to the detector
+        self.frames = 0
+        self.skipped = 0
+
+    def check(self, frame):
+        """Returns (run_inference, rois) where rois are [x, y, w, h] in frame pixels"""
+        self.frames += 1
+        height, width = frame.shape[:2]
+        scale = width / float(self.width)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (self.width, max(1, int(round(height / scale)))), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        if self._background is None:
+            self._background = small.astype(np.float32)
+            self._last_inferred = small
+            return True, [[0, 0, width, height]]
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(small, self._background, self.alpha)
+        _, mask = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, None, iterations=2)
+        motion = cv2.countNonZero(mask) / float(mask.size)
+
+        if motion < self.min_motion or self._duplicate(small, mask):
+            self.skipped += 1
+            return False, []
+
+        self._last_inferred = small
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rois = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            # Grow each region so a plate at the edge of the moving blob is kept whole
+            dx, dy = int(w * self.margin), int(h * self.margin)
+            x0, y0 = max(0, int((x - dx) * scale)), max(0, int((y - dy) * scale))
+            x1, y1 = min(width, int((x + w + dx) * scale)), min(height, int((y + h + dy) * scale))
+            rois.append([x0, y0, x1 - x0, y1 - y0])
+        return True, rois
+
+    def _duplicate(self, small, mask):
+        # Compare the moving region with the same region of the last inferred frame
+        x, y, w, h = cv2.boundingRect(cv2.findNonZero(mask))
+        current = dhash(small[y:y+h, x:x+w])
+        previous = dhash(self._last_inferred[y:y+h, x:x+w])
+        return np.count_nonzero(current != previous) <= self.dup_bits
+
+    def stats(self):
+        return {"frames": self.frames, "skipped": self.skipped, "inferred": self.frames - self.skipped}
+
+
+def union_roi(rois):
+    """Smallest [x, y, w, h] box covering every roi"""
+    x0 = min(r[0] for r in rois)
+    y0 = min(r[1] for r in rois)
+    x1 = max(r[0] + r[2] for r in rois)
+    y1 = max(r[1] + r[3] for r in rois)
+    return [x0, y0, x1 - x0, y1 - y0]
+
+
+if __name__ == "__main__":
+    # Self-check: a small dark vehicle entering a static 1080p scene is gated in
+    scene = np.tile(np.linspace(40, 200, 1920, dtype=np.uint8), (1080, 1))
+    scene = cv2.cvtColor(scene, cv2.COLOR_GRAY2BGR)
+    gate = FrameGate()
+    for _ in range(5):
+        gate.check(scene)
+    assert gate.check(scene)[0] is False, "static scene should be skipped"
+    entering = scene.copy()
+    entering[700:850, 800:1100] = 30
+    run, rois = gate.check(entering)
+    assert run and rois, "vehicle entering the scene must be inferred"
+    assert gate.check(entering)[0] is False, "repeat of the inferred frame should be skipped"
+    print("ok", gate.stats())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Gateway fronting several api.py instances (local ports or remote URLs)
+#
+#   python gateway.py --spawn 3                      # 3 local workers on 5001..5003
+#   python gateway.py --worker http://10.0.0.5:5000 --worker http://10.0.0.6:5000
+#
+# Each request goes to the worker that owns its image hash (rendezvous hashing,
+# keeps per-worker caches warm) unless that worker is busier than the least
+# loaded one by more than --slack, in which case the next worker in hash order
+# takes it. Load is the queue depth each worker reports on /health plus the
+# requests this gateway currently has in flight to it.
+#
+# Watchlist changes (POST/PUT /api/watchlist, DELETE /api/watchlist/<plate>) update
+# per-process state, so they are sent to every healthy worker instead. A worker
+# coming back up after being down gets the current watchlist copied from a
+# healthy one (GET then PUT /api/watchlist, with --admin-token) before it
+# receives traffic.
+#
+# Forwarded requests carry X-Gateway-Worker: <n>, which workers put in their
+# /images/<hash>?worker=<n> URLs; those GETs go back to worker n, whose store
+# holds the file.
+#
+# /api/export reads the DETECTION_LOG_DB of the worker it reaches: remote
+# workers must share one DB path for it to cover every worker's history.
+
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+from flask import Flask, Response, jsonify, request
+
+from serve import run_server
+
+# Headers that must not be forwarded by a proxy
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailers', 'transfer-encoding', 'upgrade', 'content-length',
+              'content-encoding', 'host'}
+
+
+class Worker:
+    def __init__(self, url, index):
+        self.url = url.rstrip('/')
+        self.index = index
+        self.session = requests.Session()
+        self.healthy = False
+        self.reported_depth = 0
+        self.in_flight = 0
+        self.failures = 0
+
+    @property
+    def load(self):
+        return self.reported_depth + self.in_flight
+
+    def describe(self):
+        return {"url": self.url, "healthy": self.healthy, "queue_depth": self.reported_depth,
+                "in_flight": self.in_flight, "failures": self.failures}
+
+
+class WorkerPool:
+    def __init__(self, urls, slack=2, health_interval=1.0, health_timeout=1.0, admin_token=None):
+        self.workers = [Worker(url, i) for i, url in enumerate(urls)]
+        self.slack = slack
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self.admin_token = admin_token
+        # Serializes broadcasts with watchlist syncs, so a recovering worker misses none
+        self._broadcast_lock = threading.Lock()
+
+    def start(self):
+        self.check_health()
+        threading.Thread(target=self._health_loop, name="gateway-health", daemon=True).start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def check_health(self):
+        for worker in self.workers:
+            try:
+                r = worker.session.get(f"{worker.url}/health", timeout=self.health_timeout)
+                r.raise_for_status()
+                inference = r.json().get("inference", {})
+                with self._lock:
+                    worker.reported_depth = inference.get("queue_depth", 0) + inference.get("in_flight", 0)
+                if not worker.healthy:
+                    self._recover(worker)
+            except (requests.RequestException, ValueError):
+                self.mark_down(worker)
+
+    def _recover(self, worker):
+        # A restarted worker only has its startup watchlist: copy it from a healthy peer first
+        with self._broadcast_lock:
+            with self._lock:
+                peer = next((w for w in self.workers if w.healthy), None)
+            if peer is not None:
+                headers = {'X-Admin-Token': self.admin_token} if self.admin_token else {}
+                snapshot = peer.session.get(f"{peer.url}/api/watchlist", headers=headers,
+                                            timeout=self.health_timeout * 30)
+                snapshot.raise_for_status()
+                worker.session.put(f"{worker.url}/api/watchlist", data=snapshot.content,
+                                   headers=dict(headers, **{'Content-Type': 'application/json'}),
+                                   timeout=self.health_timeout * 30).raise_for_status()
+            with self._lock:
+                worker.healthy = True
+
+    def broadcast(self, method, path, params, body, headers, timeout):
+        """
+        Send a request to every healthy worker; returns [(worker, response)] of
+        those that answered. Workers that fail are marked down and get the
+        whole watchlist copied when they recover.
+        """
+        with self._broadcast_lock:
+            with self._lock:
+                healthy = [w for w in self.workers if w.healthy]
+            results = []
+            for worker in healthy:
+                try:
+                    results.append((worker, worker.session.request(method, f"{worker.url}/{path}", params=params,
+                                                                   data=body, headers=headers, timeout=timeout)))
+                except requests.RequestException:
+                    self.mark_down(worker)
+            return results
+
+    def mark_down(self, worker):
+        with self._lock:
+            worker.healthy = False
+            worker.failures += 1
+
+    def candidates(self, key):
+        """Healthy workers in routing order for `key`"""
+        with self._lock:
+            healthy = [w for w in self.workers if w.healthy]
+            if not healthy:
+                return []
+            ranked = sorted(healthy, key=lambda w: hashlib.sha1(f"{w.url}|{key}".encode()).digest(), reverse=True)
+            least = min(w.load for w in healthy)
+            # Keep hash order, but skip owners that are too far above the least loaded
+            preferred = [w for w in ranked if w.load <= least + self.slack]
+            return preferred + [w for w in ranked if w not in preferred]
+
+    def owner(self, index):
+        """Worker number `index` (from an /images URL), if it exists"""
+        try:
+            return self.workers[int(index)]
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def acquire(self, worker):
+        with self._lock:
+            worker.in_flight += 1
+
+    def release(self, worker):
+        with self._lock:
+            worker.in_flight -= 1
+
+
+def routing_key(req):
+    """Hash of the image payload, so the same image always prefers the same worker"""
+    digest = hashlib.sha1()
+    if req.files:
+        for name in sorted(req.files):
+            f = req.files[name]
+            digest.update(f.read())
+            f.seek(0)
+    else:
+        digest.update(req.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def is_broadcast(method, path):
+    """Watchlist mutations, which every worker must apply"""
+    return method in ('POST', 'PUT', 'DELETE') and (path == 'api/watchlist' or
+                                             (path.startswith('api/watchlist/') and path != 'api/watchlist/match'))
+
+
+def relay(upstream, served_by, on_close=None):
+    """Stream an upstream response back (exports can be larger than memory); closes it when done"""
+    headers = [(k, v) for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP]
+    headers.append(('X-Served-By', served_by))
+    response = Response(upstream.iter_content(64 * 1024), status=upstream.status_code, headers=headers)
+    response.call_on_close(upstream.close)
+    if on_close is not None:
+        response.call_on_close(on_close)
+    return response
+
+
+def no_healthy_worker():
+    response = jsonify({"error": "NoHealthyWorker", "message": "No inference worker available"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def create_app(pool, timeout=130):
+    app = Flask(__name__)
+
+    @app.route('/gateway/status', methods=['GET'])
+    def gateway_status():
+        return jsonify({"workers": [w.describe() for w in pool.workers]})
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+    @app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+    def proxy(path):
+        body = request.get_data(cache=True)
+        key = routing_key(request) if request.method == 'POST' else path
+        headers = {k: v for k, v in request.headers.items()
+                   if k.lower() not in HOP_BY_HOP and k.lower() != 'x-gateway-worker'}
+
+        if is_broadcast(request.method, path):
+            results = pool.broadcast(request.method, path, request.args.to_dict(flat=False), body, headers, timeout)
+            if not results:
+                return no_healthy_worker()
+            if len({r.status_code for _, r in results}) > 1:
+                # Workers disagree (e.g. one already had the plate removed): report each outcome
+                return jsonify({"error": "PartialBroadcast",
+                                "workers": [{"url": w.url, "status": r.status_code} for w, r in results]}), 502
+            return relay(results[0][1], ", ".join(w.url for w, _ in results))
+
+        candidates = pool.candidates(key)
+        owner = pool.owner(request.args.get('worker')) if path.startswith('images/') else None
+        if owner in candidates:
+            candidates.remove(owner)
+            candidates.insert(0, owner)
+
+        for worker in candidates:
+            pool.acquire(worker)
+            try:
+                # stream=True: `timeout` bounds each read, not the whole body
+                upstream = worker.session.request(request.method, f"{worker.url}/{path}",
+                                                  params=request.args, data=body,
+                                                  headers=dict(headers, **{'X-Gateway-Worker': str(worker.index)}),
+                                                  timeout=timeout, stream=True)
+            except requests.ConnectionError:
+                # Worker died: take it out of rotation and fail over to the next one
+                pool.release(worker)
+                pool.mark_down(worker)
+                continue
+            except requests.Timeout:
+                pool.release(worker)
+                return jsonify({"error": "GatewayTimeout", "worker": worker.url}), 504
+            # Counted in flight until the body has been sent
+            return relay(upstream, worker.url, on_close=lambda w=worker: pool.release(w))
+
+        return no_healthy_worker()
+
+    return app
+
+
+def spawn_workers(count, base_port):
+    """
+    Start `count` local serve.py processes on consecutive ports. Each gets
+    its own image store under IMAGE_STORE and an equal share of
+    IMAGE_STORE_MAX_MB, since a store directory belongs to one process.
+    They all log to the same DETECTION_LOG_DB (SQLite WAL), so /api/export
+    on any of them covers the whole history.
+    """
+    processes, urls = [], []
+    # Workers run from this directory (they load ./weights), so pass absolute paths
+    here = os.path.dirname(os.path.abspath(__file__))
+    store = os.path.abspath(os.environ.get('IMAGE_STORE', './store'))
+    store_mb = int(os.environ.get('IMAGE_STORE_MAX_MB', 2048)) // count
+    log_db = os.path.abspath(os.environ.get('DETECTION_LOG_DB', './detection_logs.db'))
+    for i in range(count):
+        port = base_port + i
+        env = dict(os.environ, IMAGE_STORE=os.path.join(store, f"worker-{port}"), IMAGE_STORE_MAX_MB=str(store_mb),
+                   DETECTION_LOG_DB=log_db)
+        processes.append(subprocess.Popen([sys.executable, os.path.join(here, "serve.py"), "--port", str(port)],
+                                          cwd=here, env=env))
+        urls.append(f"http://127.0.0.1:{port}")
+    return processes, urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Least-loaded gateway for plate API workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--worker", action="append", default=[], help="worker base URL (repeatable)")
+    parser.add_argument("--spawn", type=int, default=0, help="start N local workers")
+    parser.add_argument("--worker-port", type=int, default=5001, help="first port for spawned workers")
+    parser.add_argument("--slack", type=int, default=2, help="extra load tolerated to keep hash affinity")
+    parser.add_argument("--timeout", type=float, default=130, help="upstream request timeout (s)")
+    parser.add_argument("--admin-token", default=os.environ.get("ADMIN_TOKEN"),
+                        help="workers' ADMIN_TOKEN, to sync the watchlist of recovering workers")
+    parser.add_argument("--threads", type=int, default=32, help="HTTP threads (each holds one upstream call)")
+    args = parser.parse_args()
+
+    processes, urls = spawn_workers(args.spawn, args.worker_port) if args.spawn else ([], [])
+    urls += args.worker
+    if not urls:
+        parser.error("give at least one --worker or --spawn N")
+
+    pool = WorkerPool(urls, slack=args.slack, admin_token=args.admin_token)
+    pool.start()
+    app = create_app(pool, timeout=args.timeout)
+    try:
+        run_server(app, args.host, args.port, args.threads)
+    finally:
+        for p in processes:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    main()
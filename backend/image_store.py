@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Content-addressed store for original, annotated and crop images (with thumbnails)
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_LEN = 64  # sha256 hex digest
+
+
+class ImageStore:
+    """
+    JPEG files named by the sha256 of their bytes under root/ab/cd/<hash>.jpg.
+
+    Identical content is written once, so concurrent requests never overwrite
+    each other's files. A thumbnail (<hash>.thumb.jpg) is made once at write
+    time when asked for. Total size is capped at `max_bytes`; the least
+    recently written or served images are evicted first.
+
+    Size accounting and eviction are in-process, so a root directory must
+    belong to a single process (gateway.py --spawn gives each worker its own).
+    """
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3, thumb_size=256):
+        # Absolute, since Flask's send_file resolves relative paths against app.root_path
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.thumb_size = thumb_size
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()  # hash -> bytes on disk (image + thumbnail)
+        self._total = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the LRU from disk, oldest modification first"""
+        found = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                digest = name.split(".", 1)[0]
+                if len(digest) != HASH_LEN or not name.endswith(".jpg"):
+                    continue
+                stat = os.stat(os.path.join(dirpath, name))
+                size, mtime = found.get(digest, (0, 0))
+                found[digest] = (size + stat.st_size, max(mtime, stat.st_mtime))
+        for digest, (size, _) in sorted(found.items(), key=lambda item: item[1][1]):
+            self._lru[digest] = size
+            self._total += size
+
+    def path(self, digest, thumbnail=False):
+        if len(digest) != HASH_LEN or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError("Invalid image hash")
+        suffix = ".thumb.jpg" if thumbnail else ".jpg"
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + suffix)
+
+    def _write(self, path, data):
+        # Write to a temp file then rename, so readers never see a partial image
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _thumbnail(self, data):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_2)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        ratio = self.thumb_size / float(max(height, width))
+        if ratio < 1:
+            image = cv2.resize(image, (max(1, int(width * ratio)), max(1, int(height * ratio))),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return buffer.tobytes() if ok else None
+
+    def put(self, data, thumbnail=False):
+        """Store JPEG bytes; returns their hash"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._lru and (not thumbnail or os.path.exists(self.path(digest, True))):
+                self._lru.move_to_end(digest)
+                return digest
+        if not os.path.exists(self.path(digest)):
+            self._write(self.path(digest), data)
+        if thumbnail and not os.path.exists(self.path(digest, True)):
+            thumb = self._thumbnail(data)
+            if thumb is not None:
+                self._write(self.path(digest, True), thumb)
+        # Size from disk, so two requests storing the same image count it once
+        size = sum(os.path.getsize(p) for p in (self.path(digest), self.path(digest, True)) if os.path.exists(p))
+        with self._lock:
+            self._total += size - self._lru.get(digest, 0)
+            self._lru[digest] = size
+            self._lru.move_to_end(digest)
+            self._evict()
+        return digest
+
+    def touch(self, digest):
+        """Mark an image as recently served"""
+        with self._lock:
+            if digest in self._lru:
+                self._lru.move_to_end(digest)
+
+    def _evict(self):
+        # Called with the lock held; never evicts the image just written
+        while self._total > self.max_bytes and len(self._lru) > 1:
+            digest, size = self._lru.popitem(last=False)
+            self._total -= size
+            for thumbnail in (False, True):
+                try:
+                    os.remove(self.path(digest, thumbnail))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {"images": len(self._lru), "bytes": self._total, "max_bytes": self.max_bytes}
@@ -2,16 +2,26 @@ import cv2
 import pytesseract
 import numpy as np
 import glob
+from arena import arena
+from utility import PerThread
 
 class PlateReader:
     def load_model(self, weight_path: str, cfg_path: str):
-        self.net = cv2.dnn.readNet(weight_path, cfg_path)
+        net = cv2.dnn.readNet(weight_path, cfg_path)
+        # cv2.dnn nets are not thread safe: every inference worker thread gets its own
+        # (this one goes to the first), so INFERENCE_WORKERS > 1 runs them in parallel
+        self._nets = PerThread(lambda: cv2.dnn.readNet(weight_path, cfg_path), first=net)
         with open("classes-ocr.names", "r") as f:
             self.classes = [line.strip() for line in f.readlines()]
-        self.layers_names = self.net.getLayerNames()
+        self.layers_names = net.getLayerNames()
         # Fix for IndexError: invalid index to scalar variable
-        self.output_layers = [self.layers_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
-        self.colors = np.random.uniform(0, 255, size=(len(self.classes), 3))
+        self.output_layers = [self.layers_names[i - 1] for i in net.getUnconnectedOutLayers()]
+        # Converted to tuples once instead of on every cv2.rectangle call
+        self.colors = [tuple(float(v) for v in c) for c in np.random.uniform(0, 255, size=(len(self.classes), 3))]
+
+    @property
+    def net(self):
+        return self._nets.get()
 
     def load_image(self, img_path):
         img = cv2.imread(img_path)
@@ -19,7 +29,8 @@ class PlateReader:
         return img, height, width, channels
 
     def read_plate(self, img):
-        blob = cv2.dnn.blobFromImage(img, scalefactor=0.00392, size=(320, 320), mean=(0, 0, 0), swapRB=True, crop=False)
+        # Same as blobFromImage, but written into this thread's reusable tensor
+        blob = arena.fill_blob(arena.blob("ocr", 1, (320, 320)), 0, img, 0.00392, (320, 320))
         self.net.setInput(blob)
         outputs = self.net.forward(self.output_layers)
         return blob, outputs
@@ -46,8 +57,13 @@ class PlateReader:
           
         return boxes, confidences, class_ids
     
-    def draw_labels(self, boxes, confidences, class_ids, img): 
-        indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.1, 0.1) # ca pouuuuuur  Suppression des doublons 
+    def keep(self, boxes, confidences):
+        # indexes des caracteres gardes apres NMS (suppression des doublons)
+        return [int(i) for i in np.array(cv2.dnn.NMSBoxes(boxes, confidences, 0.1, 0.1)).flatten()]
+
+    def draw_labels(self, boxes, confidences, class_ids, img, indexes=None):
+        if indexes is None: # ca pouuuuuur  Suppression des doublons 
+            indexes = self.keep(boxes, confidences)
         font = cv2.FONT_HERSHEY_PLAIN
         c = 0
         characters = []
@@ -114,6 +130,15 @@ class PlateReader:
         if (index == ord('c') + ord('h')):
             return "ش".encode("utf-8")
 
+    def plate_confidence(self, boxes, confidences, indexes=None):
+        # moyenne des confiances des caracteres gardes apres NMS (0 si aucun)
+        if not boxes:
+            return 0.0
+        if indexes is None:
+            indexes = self.keep(boxes, confidences)
+        kept = [confidences[i] for i in indexes]
+        return sum(kept) / len(kept) if kept else 0.0
+
     def tesseract_ocr(self, image, lang="eng", psm=7): #utile pour fallback si YOLO échoue. mais il detecte just les nombre de 0-9 et A-Z 
         alphanumeric = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
         options = "-l {} --psm {} -c tessedit_char_whitelist={}".format(lang, psm, alphanumeric)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# SQLite log of recognized plates (detection_logs table)
+
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+COLUMNS = ["id", "plate_number", "source_type", "confidence", "processing_time", "timestamp"]
+
+
+class DetectionLog:
+    """
+    Append-only recognition log. One short-lived connection per call, so it is
+    safe from any request thread; WAL mode lets exports read while live
+    traffic writes.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute('''CREATE TABLE IF NOT EXISTS detection_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plate_number TEXT,
+            source_type TEXT,
+            confidence REAL,
+            processing_time INTEGER,
+            timestamp TEXT
+        )''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_detection_logs_timestamp ON detection_logs(timestamp)")
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager commits but does not close
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, plate_number, source_type, confidence, processing_time):
+        """Insert one recognition; processing_time in milliseconds"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO detection_logs (plate_number, source_type, confidence, processing_time, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (plate_number, source_type, float(confidence), int(processing_time),
+                 datetime.now().isoformat(timespec='seconds')))
+
+    def iter_chunks(self, start=None, end=None, after_id=0, chunk_size=10000):
+        """
+        Yield lists of row tuples (COLUMNS order) with id > after_id and
+        start <= timestamp < end, `chunk_size` rows at a time
+        """
+        query = "SELECT " + ", ".join(COLUMNS) + " FROM detection_logs WHERE id > ?"
+        params = [after_id]
+        if start:
+            query += " AND timestamp >= ?"
+            params.append(start)
+        if end:
+            query += " AND timestamp < ?"
+            params.append(end)
+        query += " ORDER BY id"
+        with self._connect() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
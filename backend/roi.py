@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Per-source static regions of interest for fixed cameras (crop before inference)
+#
+# roi_config.json:
+# {
+#   "gate-north": {
+#     "frame_size": [1920, 1080],            # optional: coordinates below are pixels
+#     "rois": [
+#       {"rect": [600, 500, 900, 450]},       # x, y, w, h
+#       {"polygon": [[100, 700], [700, 650], [760, 1000], [80, 1060]]}
+#     ]
+#   },
+#   "lane-2": {"rois": [{"rect": [0.3, 0.45, 0.4, 0.35]}]}   # fractions of the frame
+# }
+
+import json
+
+import cv2
+import numpy as np
+
+
+class Roi:
+    """A rectangle or polygon stored as fractions of the frame, so it fits any decode scale"""
+
+    def __init__(self, rect=None, polygon=None):
+        if polygon is not None:
+            self.polygon = np.array(polygon, dtype=np.float32)
+            x0, y0 = self.polygon.min(axis=0)
+            x1, y1 = self.polygon.max(axis=0)
+            self.rect = (float(x0), float(y0), float(x1 - x0), float(y1 - y0))
+        else:
+            self.polygon = None
+            self.rect = tuple(float(v) for v in rect)
+
+    @property
+    def min_side(self):
+        return min(self.rect[2], self.rect[3])
+
+    def bounds(self, width, height):
+        """[x, y, w, h] in pixels of a width x height image, clipped to it"""
+        x, y, w, h = self.rect
+        x0, y0 = max(0, int(x * width)), max(0, int(y * height))
+        x1, y1 = min(width, int(round((x + w) * width))), min(height, int(round((y + h) * height)))
+        return [x0, y0, max(0, x1 - x0), max(0, y1 - y0)]
+
+    def crop(self, image):
+        """(crop, x, y): the region of `image`, pixels outside a polygon blacked out on a copy"""
+        height, width = image.shape[:2]
+        x, y, w, h = self.bounds(width, height)
+        crop = image[y:y+h, x:x+w]
+        if self.polygon is None or not crop.size:
+            return crop, x, y
+        points = np.round(self.polygon * [width, height] - [x, y]).astype(np.int32)
+        mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [points], 255)
+        return cv2.bitwise_and(crop, crop, mask=mask), x, y
+
+
+class RoiConfig:
+    def __init__(self, sources=None):
+        self.sources = sources or {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        sources = {}
+        for source, spec in raw.items():
+            frame_w, frame_h = spec.get("frame_size", (1, 1))
+            rois = []
+            for item in spec.get("rois", []):
+                if "polygon" in item:
+                    rois.append(Roi(polygon=[[px / frame_w, py / frame_h] for px, py in item["polygon"]]))
+                elif "rect" in item:
+                    x, y, w, h = item["rect"]
+                    rois.append(Roi(rect=(x / frame_w, y / frame_h, w / frame_w, h / frame_h)))
+                else:
+                    raise ValueError(f"ROI for {source!r} needs 'rect' or 'polygon'")
+            sources[source] = rois
+        return cls(sources)
+
+    def get(self, source):
+        return self.sources.get(source, []) if source else []
+
+    def decode_target(self, source, input_size=320):
+        """Short side to decode at so the smallest ROI still covers the network input"""
+        rois = self.get(source)
+        smallest = min((roi.min_side for roi in rois), default=1.0)
+        return int(np.ceil(input_size / max(smallest, 1e-3)))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Production entry point for the plate API (api.py keeps the debug dev server)
+#
+# HTTP threads only parse requests and encode responses; model inference is
+# handed to the bounded scheduler in serving.py, which sheds load with
+# 429/503 + Retry-After instead of letting the queue grow without limit.
+
+import argparse
+import os
+
+
+def run_server(app, host, port, threads=16):
+    """Serve a WSGI app with waitress, or werkzeug's threaded server without it (also used by gateway.py)"""
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    if serve is not None:
+        # Connections beyond the thread pool wait in waitress' own backlog
+        serve(app, host=host, port=port, threads=threads,
+              connection_limit=threads * 4, channel_timeout=120)
+    else:
+        from werkzeug.serving import run_simple
+        run_simple(host, port, app, threaded=True, use_reloader=False, use_debugger=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the plate detection API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("--threads", type=int, default=16, help="HTTP threads (not inference workers)")
+    parser.add_argument("--inference-workers", type=int, help="overrides INFERENCE_WORKERS (each loads its own copy of the models)")
+    parser.add_argument("--queue", type=int, help="overrides INFERENCE_QUEUE")
+    args = parser.parse_args()
+
+    # The scheduler is built when api is imported, so configure it first
+    if args.inference_workers:
+        os.environ["INFERENCE_WORKERS"] = str(args.inference_workers)
+    if args.queue:
+        os.environ["INFERENCE_QUEUE"] = str(args.queue)
+
+    from api import app
+    run_server(app, args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Admission control for model inference: bounded priority queue, deadlines, load shedding
+
+import itertools
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from utility import enum
+
+# Lower value is served first
+PRIORITIES = enum('INTERACTIVE', 'BULK')
+
+
+class ServingError(Exception):
+    """Base class for requests refused by the scheduler"""
+    status_code = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Overloaded(ServingError):
+    """Inference queue is full"""
+    status_code = 503
+
+
+class Throttled(ServingError):
+    """Bulk traffic exceeds its share of the queue"""
+    status_code = 429
+
+
+class DeadlineExceeded(ServingError):
+    """The request deadline passed before inference finished"""
+    status_code = 504
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "deadline", "future")
+
+    def __init__(self, fn, args, kwargs, deadline):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+        self.future = Future()
+
+
+class InferenceScheduler:
+    """
+    Serialize model calls through a small pool of worker threads.
+
+    The cv2.dnn networks are not safe to run concurrently; each worker thread
+    loads its own copy on first use (utility.PerThread), so every worker past
+    the first costs one more set of model weights in memory. Jobs are ordered by priority then arrival,
+    the queue is bounded (`max_queue`), bulk jobs may only fill `bulk_share`
+    of it, and a job whose deadline has passed is dropped without running.
+    """
+
+    def __init__(self, workers=1, max_queue=32, bulk_share=0.5):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.bulk_limit = max(1, int(max_queue * bulk_share))
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._depth = {PRIORITIES.INTERACTIVE: 0, PRIORITIES.BULK: 0}
+        self._in_flight = 0
+        self._service_time = 0.5  # EWMA of seconds per job, seeds Retry-After
+        self.shed = 0
+        self.expired = 0
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True).start()
+
+    @property
+    def queue_depth(self):
+        with self._lock:
+            return sum(self._depth.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": sum(self._depth.values()),
+                "in_flight": self._in_flight,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "service_time_ms": round(self._service_time * 1000, 1),
+                "shed": self.shed,
+                "expired": self.expired,
+            }
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        with self._lock:
+            backlog = sum(self._depth.values()) + self._in_flight
+        return max(1, math.ceil(backlog * self._service_time / self.workers))
+
+    def submit(self, priority, timeout, fn, *args, **kwargs):
+        """Queue `fn` or raise Overloaded/Throttled; returns a Future"""
+        job = _Job(fn, args, kwargs, time.monotonic() + timeout)
+        with self._lock:
+            total = sum(self._depth.values())
+            if total >= self.max_queue:
+                self.shed += 1
+                error = Overloaded
+            elif priority == PRIORITIES.BULK and self._depth[PRIORITIES.BULK] >= self.bulk_limit:
+                self.shed += 1
+                error = Throttled
+            else:
+                error = None
+                self._depth[priority] += 1
+                self._queue.put((priority, next(self._seq), job))
+        if error is not None:
+            raise error("Inference queue saturated", retry_after=self.retry_after())
+        return job.future
+
+    def run(self, priority, timeout, fn, *args, **kwargs):
+        """Run `fn` on an inference worker and wait for it within `timeout` seconds"""
+        future = self.submit(priority, timeout, fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # A queued job is dropped; a running one finishes but its result is discarded
+            future.cancel()
+            raise DeadlineExceeded("Request deadline exceeded", retry_after=self.retry_after())
+
+    def _worker(self):
+        while True:
+            priority, _, job = self._queue.get()
+            with self._lock:
+                self._depth[priority] -= 1
+            if time.monotonic() > job.deadline or not job.future.set_running_or_notify_cancel():
+                # Client has already given up on this request
+                with self._lock:
+                    self.expired += 1
+                if not job.future.done():
+                    job.future.set_exception(DeadlineExceeded("Request deadline exceeded"))
+                continue
+            with self._lock:
+                self._in_flight += 1
+            start = time.monotonic()
+            try:
+                job.future.set_result(job.fn(*job.args, **job.kwargs))
+            except BaseException as e:
+                job.future.set_exception(e)
+            finally:
+                elapsed = time.monotonic() - start
+                with self._lock:
+                    self._in_flight -= 1
+                    self._service_time = 0.8 * self._service_time + 0.2 * elapsed
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Bounded pool of Tesseract worker processes used as OCR fallback when YOLO fails
+
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+ALPHANUMERIC = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+class _Worker:
+    """
+    One long-lived `python tesseract_pool.py --worker` process. Requests and
+    replies are pickled over its stdin/stdout; a reader thread hands replies
+    to a queue so the caller can wait on them with a timeout.
+    """
+
+    def __init__(self, psm, timeout):
+        command = [sys.executable, os.path.abspath(__file__), "--worker", str(psm), str(timeout)]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read, name="tesseract-reader", daemon=True).start()
+
+    def _read(self):
+        try:
+            while True:
+                self.replies.put(pickle.load(self.process.stdout))
+        except (EOFError, OSError, pickle.UnpicklingError):
+            self.replies.put(None)
+
+    def recognize(self, image, lang, timeout):
+        """Text of `image`; raises queue.Empty on timeout, OSError/EOFError if the process died"""
+        pickle.dump((image, lang), self.process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        self.process.stdin.flush()
+        reply = self.replies.get(timeout=timeout)
+        if reply is None:
+            raise EOFError("tesseract worker exited")
+        ok, value = reply
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+
+class TesseractPool:
+    """
+    Run Tesseract OCR on a fixed number of persistent worker processes.
+
+    Each worker keeps one tesserocr TessBaseAPI per language alive, so a call
+    costs one recognition instead of a tesseract process spawn (without
+    tesserocr installed, workers fall back to pytesseract per call). A call
+    that takes longer than `timeout` gets its worker killed and replaced, so
+    a hung recognition never holds a slot. Submissions are refused (None)
+    when every worker is busy instead of queueing.
+    """
+
+    def __init__(self, max_workers=2, timeout=2.0, psm=7):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.psm = psm
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tesseract")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._idle = queue.Queue()
+        for _ in range(max_workers):
+            self._idle.put(_Worker(psm, timeout))
+
+    def _run(self, image, lang):
+        worker = self._idle.get()
+        try:
+            return worker.recognize(image, lang, self.timeout)
+        except (queue.Empty, EOFError, OSError):
+            # Hung or dead: a killed process is the only way to stop a recognition
+            worker.kill()
+            worker = _Worker(self.psm, self.timeout)
+            return ""
+        finally:
+            self._idle.put(worker)
+            self._slots.release()
+
+    def submit(self, image, lang="eng"):
+        """Queue an OCR call on a private copy of `image`, or return None when saturated"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            return self._executor.submit(self._run, image.copy(), lang)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def result(self, future):
+        """Wait for a submitted call at most `timeout` seconds; returns '' on timeout"""
+        if future is None:
+            return ""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            return ""
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        while not self._idle.empty():
+            self._idle.get().kill()
+
+
+def _serve(psm, timeout):
+    """Worker process loop: (image, lang) in on stdin, (ok, text or error) out on stdout"""
+    # Keep the pickle stream private: anything printed (C libraries included) goes to stderr
+    replies = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    requests = sys.stdin.buffer
+
+    try:
+        import tesserocr
+        from PIL import Image
+    except ImportError:
+        tesserocr = None
+        import pytesseract
+
+    apis = {}
+
+    def recognize(image, lang):
+        rgb = np.ascontiguousarray(image[:, :, ::-1]) if image.ndim == 3 else image
+        if tesserocr is None:
+            options = "-l {} --psm {} -c tessedit_char_whitelist={}".format(lang, psm, ALPHANUMERIC)
+            # Its own timeout, so killing this worker never leaves a tesseract process behind
+            return pytesseract.image_to_string(rgb, config=options, timeout=timeout).strip()
+        if lang not in apis:
+            apis[lang] = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+            apis[lang].SetVariable("tessedit_char_whitelist", ALPHANUMERIC)
+        apis[lang].SetImage(Image.fromarray(rgb))
+        return apis[lang].GetUTF8Text().strip()
+
+    while True:
+        try:
+            image, lang = pickle.load(requests)
+        except EOFError:
+            return
+        try:
+            reply = (True, recognize(image, lang))
+        except Exception as e:
+            reply = (False, str(e))
+        pickle.dump(reply, replies, protocol=pickle.HIGHEST_PROTOCOL)
+        replies.flush()
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--worker"]:
+    _serve(int(sys.argv[2]), float(sys.argv[3]))
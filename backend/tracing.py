@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Per-request stage timings (Server-Timing) and an on-demand sampling profiler
+
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_trace = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Stage durations of one request; shared with inference workers through a copied context"""
+
+    def __init__(self, profiled=False):
+        self.profiled = profiled
+        self._stages = {}  # name -> ms, in first-seen order
+        self._lock = threading.Lock()
+
+    def add(self, name, ms):
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0.0) + ms
+
+    def as_dict(self):
+        with self._lock:
+            return {name: round(ms, 2) for name, ms in self._stages.items()}
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.as_dict().items())
+
+
+def start_trace(profiled=False):
+    """Attach a new trace to the current context; returns (trace, token for end_trace)"""
+    trace = RequestTrace(profiled)
+    return trace, _trace.set(trace)
+
+
+def end_trace(token):
+    _trace.reset(token)
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a block into the current request trace (no-op outside a request)"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - start) * 1000)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler armed for the next N requests.
+
+    A background thread samples the stacks of the threads attached to a
+    profiled request (its HTTP thread and the inference worker running its
+    job) every `interval` seconds. Output is the collapsed stack format
+    ("frame;frame;frame count") read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._threads = Counter()  # thread ident -> attach count
+        self._remaining = 0
+        self._requested = 0
+        self._completed = 0
+        self._interval = 0.005
+        self._running = False
+
+    def arm(self, requests, interval=0.005):
+        with self._lock:
+            self._stacks.clear()
+            self._requested = self._remaining = requests
+            self._completed = 0
+            self._interval = interval
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._sample_loop, name="profiler", daemon=True).start()
+
+    def claim(self):
+        """True if the calling request should be profiled (consumes one slot)"""
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    def attach(self, ident):
+        with self._lock:
+            self._threads[ident] += 1
+
+    def detach(self, ident):
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def finish_request(self):
+        with self._lock:
+            self._completed += 1
+            if self._completed >= self._requested and self._remaining <= 0:
+                self._running = False
+
+    def status(self):
+        with self._lock:
+            return {"requested": self._requested, "completed": self._completed,
+                    "remaining": self._remaining, "running": self._running,
+                    "samples": sum(self._stacks.values())}
+
+    def collapsed(self):
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                interval = self._interval
+                threads = [t for t in self._threads if t != me]
+            frames = sys._current_frames()
+            samples = []
+            for ident in threads:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    samples.append(";".join(reversed(stack)))
+            if samples:
+                with self._lock:
+                    self._stacks.update(samples)
+            time.sleep(interval)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Response encodings for the API: base64 JSON (default), msgpack, multipart/mixed
+
+import base64
+import json
+import uuid
+
+from flask import Response, jsonify
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MULTIPART = 'multipart/mixed'
+
+# Raw image bodies accepted in place of base64 JSON / multipart form uploads
+RAW_IMAGE_TYPES = ('application/octet-stream', 'image/jpeg', 'image/png')
+
+
+def negotiate(accept_mimetypes):
+    """Pick the response encoding from the Accept header; JSON unless a binary type is asked for"""
+    offers = [JSON, MULTIPART, 'application/x-msgpack']
+    if msgpack is not None:
+        offers.insert(1, MSGPACK)
+    # JSON is offered first, so browsers sending */* keep getting it
+    best = accept_mimetypes.best_match(offers, default=JSON)
+    if best == 'application/x-msgpack':
+        best = MSGPACK if msgpack is not None else JSON
+    return best
+
+
+def _walk(value, on_bytes):
+    # memoryviews (cv2.imencode buffers) are passed through uncopied
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return on_bytes(value)
+    if isinstance(value, dict):
+        return {k: _walk(v, on_bytes) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_walk(v, on_bytes) for v in value]
+    return value
+
+
+def to_json(payload):
+    """Replace raw image bytes by base64 strings (the frontend's format)"""
+    return _walk(payload, lambda b: base64.b64encode(b).decode('utf-8'))
+
+
+def encode(payload, mimetype, status=200):
+    """
+    Build the response for `payload`, a JSON-able dict whose images are raw JPEG bytes.
+
+    - application/json: images as base64 strings
+    - application/msgpack: images as msgpack bin values
+    - multipart/mixed: first part is the JSON metadata where each image is
+      replaced by "cid:<id>", then one image/jpeg part per image
+    """
+    if mimetype == MSGPACK:
+        return Response(msgpack.packb(_walk(payload, bytes), use_bin_type=True), status=status, mimetype=MSGPACK)
+
+    if mimetype == MULTIPART:
+        parts = []
+
+        def attach(data):
+            cid = f"img{len(parts)}"
+            parts.append((cid, data))
+            return f"cid:{cid}"
+
+        metadata = json.dumps(_walk(payload, attach)).encode('utf-8')
+        boundary = uuid.uuid4().hex
+        chunks = [f"--{boundary}\r\nContent-Type: {JSON}\r\n\r\n".encode(), metadata, b"\r\n"]
+        for cid, data in parts:
+            chunks.append(f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-ID: <{cid}>\r\n"
+                          f"Content-Length: {len(data)}\r\n\r\n".encode())
+            chunks.append(data)
+            chunks.append(b"\r\n")
+        chunks.append(f"--{boundary}--\r\n".encode())
+        return Response(b"".join(chunks), status=status,
+                        content_type=f'{MULTIPART}; boundary={boundary}')
+
+    response = jsonify(to_json(payload))
+    response.status_code = status
+    return response
@@ -1,3 +1,30 @@
+import threading
+
+
 def enum(*sequential, **named):
     enums = dict(zip(sequential, range(len(sequential))), **named)
     return type('Enum', (), enums)
+
+
+class PerThread:
+    """
+    One instance per thread of an object that is not thread safe (cv2.dnn nets),
+    built by `factory` on first use. `first`, when given, goes to the first
+    thread that asks instead of building a new one.
+    """
+
+    def __init__(self, factory, first=None):
+        self._factory = factory
+        self._spare = first
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self):
+        obj = getattr(self._local, "obj", None)
+        if obj is None:
+            with self._lock:
+                obj, self._spare = self._spare, None
+            if obj is None:
+                obj = self._factory()
+            self._local.obj = obj
+        return obj
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Fuzzy watchlist/hotlist index for recognized plates (weighted edit distance over a deletion index)
+
+import csv
+import re
+import threading
+import unicodedata
+
+# Arabic letter of Moroccan plates -> one latin symbol, so keys stay plain ASCII
+ARABIC_TO_KEY = {"أ": "A", "ا": "A", "ب": "B", "و": "W", "د": "D", "ه": "H", "ش": "C"}
+# PlateReader labels that were not converted to Arabic (longest first)
+TOKEN_TO_KEY = [("waw", "W"), ("ch", "C"), ("w", "W"), ("a", "A"), ("b", "B"), ("d", "D"), ("h", "H")]
+
+# Costs are in tenths of an edit so distances stay integers
+EDIT_COST = 10
+CONFUSIONS = {
+    ("8", "B"): 3,
+    ("0", "D"): 4,
+    ("0", "O"): 2,
+    ("1", "I"): 2,
+    ("5", "S"): 3,
+    ("2", "Z"): 4,
+    ("6", "G"): 4,
+    ("A", "W"): 5,   # 'waw' vs 'a' tokens
+    ("H", "4"): 6,
+    ("3", "8"): 6,
+}
+
+
+def normalize_plate(text):
+    """
+    Canonical key for a plate, e.g. '12345 | ب | 6' (PlateReader.draw_labels),
+    '12345waw6' (unconverted labels) or '12345B6' (tesseract) -> '12345B6' / '12345W6'
+    """
+    # NFKC folds reshaped Arabic presentation forms back to base letters
+    key = "".join(ARABIC_TO_KEY.get(c, c) for c in unicodedata.normalize("NFKC", text))
+    if any(c.islower() for c in key):
+        # Lower case letters only come from raw YOLO labels
+        for token, symbol in TOKEN_TO_KEY:
+            key = key.replace(token, symbol)
+    return re.sub(r"[^0-9A-Z]", "", key.upper())
+
+
+def _substitution_costs(confusions):
+    """Symmetric cost table closed under shortest paths, so the edit distance is a metric"""
+    chars = sorted({c for pair in confusions for c in pair})
+    cost = {(a, b): (0 if a == b else EDIT_COST) for a in chars for b in chars}
+    for (a, b), c in confusions.items():
+        cost[(a, b)] = cost[(b, a)] = min(c, EDIT_COST)
+    for k in chars:
+        for a in chars:
+            for b in chars:
+                if cost[(a, k)] + cost[(k, b)] < cost[(a, b)]:
+                    cost[(a, b)] = cost[(a, k)] + cost[(k, b)]
+    return cost
+
+
+class PlateDistance:
+    def __init__(self, confusions=CONFUSIONS):
+        self.costs = _substitution_costs(confusions)
+
+    def __call__(self, s, t):
+        costs = self.costs
+        previous = list(range(0, (len(t) + 1) * EDIT_COST, EDIT_COST))
+        for i, a in enumerate(s, 1):
+            current = [i * EDIT_COST]
+            for j, b in enumerate(t, 1):
+                sub = 0 if a == b else costs.get((a, b), EDIT_COST)
+                current.append(min(previous[j] + EDIT_COST,
+                                   current[j - 1] + EDIT_COST,
+                                   previous[j - 1] + sub))
+            previous = current
+        return previous[-1]
+
+
+def _confusion_classes(confusions):
+    """Map each character to one representative of its confusion group"""
+    parent = {}
+
+    def find(c):
+        while parent.get(c, c) != c:
+            c = parent[c]
+        return c
+
+    for a, b in confusions:
+        parent[find(a)] = find(b)
+    return {c: find(c) for pair in confusions for c in pair}
+
+
+def _deletions(key, depth):
+    """`key` and every string obtained by deleting up to `depth` characters"""
+    variants = {key}
+    frontier = {key}
+    for _ in range(depth):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+class WatchlistIndex:
+    """
+    In-memory watchlist keyed by normalized plate.
+
+    Confusable characters are first folded to one class ('8' and 'B' become
+    the same symbol), so two plates within `max_edits` real edits share a
+    string after at most `max_edits` deletions on each side. Every key is
+    indexed under those deletion variants; a lookup hashes the variants of
+    the query and only scores the few candidates found with the weighted
+    distance. Add/remove touch len(key)**max_edits dict entries.
+    """
+
+    def __init__(self, max_edits=1, confusions=CONFUSIONS):
+        self.max_edits = max_edits
+        self.confusions = confusions
+        self.distance = PlateDistance(confusions)
+        self._classes = _confusion_classes(confusions)
+        self._entries = {}   # key -> list of entry dicts
+        self._variants = {}  # deletion variant -> key or list of keys
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _class_key(self, key):
+        return "".join(self._classes.get(c, c) for c in key)
+
+    def add(self, plate, **info):
+        key = normalize_plate(plate)
+        if not key:
+            raise ValueError(f"Invalid plate: {plate!r}")
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries is None:
+                entries = self._entries[key] = []
+                for variant in _deletions(self._class_key(key), self.max_edits):
+                    # Most variants map to a single key; keep those as plain strings
+                    keys = self._variants.get(variant)
+                    if keys is None:
+                        self._variants[variant] = key
+                    elif isinstance(keys, str):
+                        self._variants[variant] = [keys, key]
+                    else:
+                        keys.append(key)
+            entry = dict(info, plate=plate)
+            # Idempotent: adding the same entry twice keeps one
+            if entry not in entries:
+                entries.append(entry)
+        return key
+
+    def remove(self, plate):
+        key = normalize_plate(plate)
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            for variant in _deletions(self._class_key(key), self.max_edits):
+                keys = self._variants.get(variant)
+                if isinstance(keys, str):
+                    del self._variants[variant]
+                elif keys is not None:
+                    keys.remove(key)
+                    if len(keys) == 1:
+                        self._variants[variant] = keys[0]
+        return True
+
+    def match(self, plate, max_distance=1.0):
+        """Entries within `max_distance` edits of `plate` (below max_edits + 1), closest first"""
+        if max_distance >= self.max_edits + 1:
+            raise ValueError(f"max_distance must be below {self.max_edits + 1} for this index")
+        key = normalize_plate(plate)
+        if not key:
+            return []
+        radius = int(round(max_distance * EDIT_COST))
+        with self._lock:
+            candidates = set()
+            for variant in _deletions(self._class_key(key), self.max_edits):
+                keys = self._variants.get(variant)
+                if isinstance(keys, str):
+                    candidates.add(keys)
+                elif keys is not None:
+                    candidates.update(keys)
+            hits = sorted((d, k) for k in candidates if (d := self.distance(key, k)) <= radius)
+            return [{"key": k, "distance": d / EDIT_COST, "entries": list(self._entries[k])} for d, k in hits]
+
+    def entries(self):
+        """Every entry dict (plate + info); the input of replace()"""
+        with self._lock:
+            return [entry for entries in self._entries.values() for entry in entries]
+
+    def replace(self, entries):
+        """Swap the whole content for `entries` (dicts with a 'plate' key); returns the number of plates"""
+        fresh = WatchlistIndex(self.max_edits, self.confusions)
+        for entry in entries:
+            info = {k: v for k, v in entry.items() if k != "plate"}
+            fresh.add(str(entry.get("plate", "")), **info)
+        with self._lock:
+            self._entries, self._variants = fresh._entries, fresh._variants
+        return len(fresh)
+
+    def load_csv(self, path):
+        """Load `plate[,list[,note]]` rows; returns the number of plates added"""
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip() or row[0].startswith("#"):
+                    continue
+                info = {"list": row[1].strip() if len(row) > 1 else "default"}
+                if len(row) > 2:
+                    info["note"] = row[2].strip()
+                try:
+                    self.add(row[0].strip(), **info)
+                    count += 1
+                except ValueError:
+                    continue
+        return count
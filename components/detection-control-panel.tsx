@@ -123,15 +123,16 @@ export function DetectionControlPanel({ onStateChange, isProcessing }: Detection
           }))
 
           // Add to gallery after successful detection and OCR
+          // (server URLs: the gallery is persisted, base64 images would fill localStorage)
           addGalleryItem({
-            thumbnail: detectionImageUrl,
+            thumbnail: plateAPI.imageUrl(detectionResult.thumbnail_url) || detectionImageUrl,
             plateNumber: ocrResult.plate_text,
             confidence: 96.8,
             modelName: "YOLOv3",
             tags: [parsedPlate.regionName, "Détection automatique"],
             status: "Analysé",
-            originalImage: imageUrl,
-            detectionImage: detectionImageUrl,
+            originalImage: plateAPI.imageUrl(detectionResult.original_image_url) || imageUrl,
+            detectionImage: plateAPI.imageUrl(detectionResult.detection_image_url) || detectionImageUrl,
             ocrResult: finalOcrResult,
           })
 
@@ -207,14 +208,14 @@ export function DetectionControlPanel({ onStateChange, isProcessing }: Detection
 
           // Add video detection to gallery
           addGalleryItem({
-            thumbnail: detectionImageUrl,
+            thumbnail: plateAPI.imageUrl(result.thumbnail_url) || detectionImageUrl,
             plateNumber: "Détection vidéo",
             confidence: 94.5,
             modelName: "YOLOv3",
             tags: ["Vidéo", "Détection automatique"],
             status: "Analysé",
-            originalImage: originalImageUrl,
-            detectionImage: detectionImageUrl,
+            originalImage: plateAPI.imageUrl(result.original_image_url) || originalImageUrl,
+            detectionImage: plateAPI.imageUrl(result.detection_image_url) || detectionImageUrl,
           })
         }
 
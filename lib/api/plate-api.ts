@@ -27,9 +27,13 @@ export interface FlaskDetectionResponse {
   status: string
   original_image: string
   detection_image: string
+  original_image_url?: string
+  detection_image_url?: string
+  thumbnail_url?: string
   detection: Array<{
     plate_index: number
     plate_image: string
+    plate_image_url?: string
   }>
 }
 
@@ -37,6 +41,8 @@ export interface FlaskOCRResponse {
   status: string
   plate_text: string
   segmented_image: string
+  segmented_image_url?: string
+  thumbnail_url?: string
 }
 
 export interface UploadResponse {
@@ -145,6 +151,10 @@ class PlateAPI {
     detection_image?: string
     original_image?: string
     plate_images?: string[]
+    detection_image_url?: string
+    original_image_url?: string
+    thumbnail_url?: string
+    plate_image_urls?: string[]
   }> {
     const formData = new FormData()
     formData.append("video", file)
@@ -256,6 +266,12 @@ class PlateAPI {
     }
   }
 
+  // Image URLs returned by the backend (/images/<hash>) are relative to the API, not to this app
+  imageUrl(path?: string): string | undefined {
+    if (!path) return undefined
+    return path.startsWith("/") ? `${API_BASE_URL}${path}` : path
+  }
+
   // Helper method to convert base64 to File for OCR
   base64ToFile(base64String: string, filename = "plate.jpg"): File {
     const arr = base64String.split(",")